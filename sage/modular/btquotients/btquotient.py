@@ -11,7 +11,7 @@ Compute arithmetic quotients of the Bruhat-Tits tree
 """
 from sage.rings.integer import Integer
 from sage.structure.element import Element
-from sage.matrix.constructor import Matrix
+from sage.matrix.constructor import Matrix, block_diagonal_matrix
 from sage.matrix.matrix_space import MatrixSpace
 from sage.structure.sage_object import SageObject
 from sage.rings.all import ZZ,Zmod,QQ
@@ -28,7 +28,6 @@ from sage.rings.padics.all import Qp,Zp
 from sage.algebras.quatalg.all import QuaternionAlgebra
 from sage.quadratic_forms.all import QuadraticForm
 from sage.graphs.all import Graph
-from sage.libs.all import pari
 from sage.interfaces.all import magma
 from copy import copy
 from sage.plot.colors import rainbow
@@ -38,7 +37,50 @@ from sage.misc.lazy_attribute import lazy_attribute
 from sage.modular.dirichlet import DirichletGroup
 from sage.modular.arithgroup.congroup_gammaH import GammaH_class
 from sage.rings.arith import fundamental_discriminant
-from sage.misc.misc import verbose, cputime
+from sage.misc.misc import verbose, cputime, DOT_SAGE
+from sage.structure.sage_object import save, load, dumps, loads
+from hashlib import sha1
+import os
+
+## The version of the files written by BTQuotient.save_data. Increase it
+## whenever the layout of the saved data changes, so that old files are
+## ignored.
+_STORE_VERSION = 1
+
+def _lift_square_root(c,r,p,n,N):
+    r"""
+    Lifts a square root of ``c`` modulo `p^n` to a square root of
+    ``c`` modulo `p^N`, using Newton's method.
+
+    INPUT:
+
+    - ``c`` - an integer, which is a unit modulo the odd prime ``p``.
+
+    - ``r`` - an integer such that `r^2 \equiv c \pmod{p^n}`.
+
+    - ``p`` - an odd prime.
+
+    - ``n``, ``N`` - positive integers.
+
+    OUTPUT:
+
+    An integer congruent to ``r`` modulo `p^n` whose square is
+    congruent to ``c`` modulo `p^N`. The work only depends on the
+    number of digits gained.
+
+    EXAMPLES::
+
+        sage: from sage.modular.btquotients.btquotient import _lift_square_root
+        sage: r = _lift_square_root(2,3,7,1,20)
+        sage: (r^2-2) % 7^20, r % 7
+        (0, 3)
+    """
+    r=ZZ(r)
+    while n < N:
+        n=min(2*n,N)
+        pn=p**n
+        r=(r-(r*r-c)*(2*r).inverse_mod(pn))%pn
+    return r
 
 class DoubleCosetReduction(SageObject):
     r"""
@@ -308,8 +350,10 @@ class DoubleCosetReduction(SageObject):
             else:
                 self._cached_t = (self.igamma(tmp_prec)*e.opposite.rep).inverse()*self.x
                 # assert self._cached_t[1,0].valuation()>self._cached_t[1,1].valuation()
-            tmp_prec += 1
             self._t_prec = min([xx.precision_absolute() for xx in self._cached_t.list()])
+            # The loss of precision does not depend on tmp_prec, so
+            # make up for all of it at once
+            tmp_prec += max([1,prec - self._t_prec])
         return self._cached_t
 
 class BruhatTitsTree(SageObject, UniqueRepresentation):
@@ -1415,8 +1459,17 @@ class BTQuotient(SageObject, UniqueRepresentation):
         self._cached_paths=dict()
         self._cached_decomps=dict()
         self._cached_equivalent=dict()
+        self._cached_fingerprints=dict()
+        self._cached_acting_matrices=dict()
+        self._cached_kernel_data=dict()
+        self._vertex_buckets=None
         self._CM_points=dict()
 
+        ## The saved data, read from disk by load_data
+        self._seed=seed
+        self._store=None
+        self._stored_prec=-1
+
         self._V=(QQ**4).ambient_module().change_ring(ZZ)
         self._Mat_44=MatrixSpace(ZZ,4,4)
         self._Mat_22=MatrixSpace(ZZ,2,2)
@@ -1462,6 +1515,210 @@ class BTQuotient(SageObject, UniqueRepresentation):
         else:
             return True
 
+    def _store_key(self):
+        r"""
+        Returns the data identifying the saved computations of self.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: X._store_key()[:3]
+            (5, 13, 1)
+        """
+        chi=self._character
+        return (self._p,self._Nminus,self._Nplus,(chi.modulus(),tuple([str(a) for a in chi.values_on_gens()])),self._seed,self._use_magma)
+
+    def default_store_filename(self):
+        r"""
+        Returns the file in which :meth:`save_data` saves the
+        computations of self by default. The name depends on `p`, the
+        levels, the character, the seed and whether magma is used.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: from sage.misc.misc import DOT_SAGE
+            sage: X.default_store_filename().startswith(DOT_SAGE)
+            True
+        """
+        key=sha1(repr(self._store_key())).hexdigest()[:16]
+        return os.path.join(DOT_SAGE,'btquotients','X_%s_%s_%s_%s.sobj'%(self._p,self._Nminus,self._Nplus,key))
+
+    def _computed_data(self):
+        r"""
+        Returns a dictionary with the data computed so far which can be
+        saved, indexed by the name of each component.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,17)
+            sage: 'quotient' in X._computed_data()
+            False
+            sage: X.genus_no_formula() == X.genus()
+            True
+            sage: 'quotient' in X._computed_data()
+            True
+        """
+        data=dict()
+        if hasattr(self,'_vertex_list'):
+            data['quotient']=dict([(name,getattr(self,name)) for name in ['_generators','_boundary','_edge_list','_vertex_list','_vertex_buckets','_num_edges','_S','_Sfun']])
+        if self._prec > 0:
+            data['embedding']=dict([(name,getattr(self,name)) for name in ['_prec','_Iota','_Iotainv_lift','_II','_JJ','_KK','_splitting_sqrt','_cached_Iota0_matrix'] if hasattr(self,name)])
+        if hasattr(self,'_edge_stabs'):
+            data['edge_stabs']=self._edge_stabs
+        if hasattr(self,'_vertex_stabs'):
+            data['vertex_stabs']=self._vertex_stabs
+        if self._get_Up_data.is_in_cache():
+            data['Up']=self._get_Up_data()
+        for key,value in self._get_hecke_data.cache.items():
+            data[('hecke',)+tuple(key[0])]=value
+        for key,value in self._get_atkin_lehner_data.cache.items():
+            data[('atkin_lehner',)+tuple(key[0])]=value
+        return data
+
+    def save_data(self,filename=None):
+        r"""
+        Saves the quotient graph, the embedding, the stabilizers and
+        the Hecke data computed so far, so that other sessions can
+        load them instead of computing them again.
+
+        Components already in the file and not computed in this
+        session are kept. Each component is pickled separately, so
+        that loading only unpickles the ones which are used.
+
+        INPUT:
+
+        - ``filename`` - string (Default: None). The file to write
+          to. If None, use :meth:`default_store_filename`.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: X.genus_no_formula() == X.genus()
+            True
+            sage: fname = tmp_filename() + '.sobj'
+            sage: X.save_data(fname)
+            sage: X.load_data(fname)
+            True
+            sage: X._stored('quotient')['_num_edges'] == len(X.get_edge_list())
+            True
+        """
+        if filename is None:
+            filename=self.default_store_filename()
+        directory=os.path.dirname(filename)
+        if directory != '' and not os.path.exists(directory):
+            os.makedirs(directory)
+        components=dict()
+        old=self._read_store(filename)
+        if old is not None:
+            components.update(old)
+        if self._store is not None:
+            components.update(self._store)
+        for name,value in self._computed_data().items():
+            components[name]=dumps(value)
+        if filename.endswith('.sobj'):
+            tmp=filename[:-5]+'.%s.sobj'%os.getpid()
+        else:
+            tmp=filename+'.%s.sobj'%os.getpid()
+        save({'version':_STORE_VERSION,'key':self._store_key(),'components':components},tmp)
+        os.rename(tmp,filename)
+
+    def _read_store(self,filename):
+        r"""
+        Returns the pickled components in ``filename``, or None if
+        the file does not exist, was written by another version or
+        belongs to another quotient.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: print X._read_store(tmp_filename() + '.sobj')
+            None
+        """
+        if not os.path.exists(filename):
+            return None
+        try:
+            data=load(filename)
+        except (IOError,EOFError,ValueError):
+            verbose('Could not read %s'%filename)
+            return None
+        if data.get('version') != _STORE_VERSION or data.get('key') != self._store_key():
+            verbose('Ignoring %s, which was saved by another version or for another quotient'%filename)
+            return None
+        return data['components']
+
+    def load_data(self,filename=None):
+        r"""
+        Reads the computations saved by :meth:`save_data`.
+
+        Only the index of the file is read: each component is
+        unpickled the first time it is needed. Saved data is never
+        read unless this is called.
+
+        INPUT:
+
+        - ``filename`` - string (Default: None). The file to read. If
+          None, use :meth:`default_store_filename`.
+
+        OUTPUT:
+
+        True if data for self was found, False otherwise.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: X.load_data(tmp_filename() + '.sobj')
+            False
+
+        A new instance can use the saved embedding and quotient::
+
+            sage: X = BTQuotient(3,7)
+            sage: A = X.get_embedding_matrix(prec = 5)
+            sage: X.genus_no_formula() == X.genus()
+            True
+            sage: fname = tmp_filename() + '.sobj'
+            sage: X.save_data(fname)
+            sage: Y = BTQuotient.__new__(BTQuotient); Y.__init__(3,7)
+            sage: Y.load_data(fname)
+            True
+            sage: Y.get_embedding_matrix() == A
+            True
+            sage: M = Matrix(ZZ,2,2,[1,3,2,7])
+            sage: M.set_immutable()
+            sage: Y.fundom_rep(M)
+            Vertex of BT-tree for p = 3
+        """
+        if filename is None:
+            filename=self.default_store_filename()
+        components=self._read_store(filename)
+        if self._store is None:
+            self._store=dict()
+        if components is None:
+            return False
+        self._store.update(components)
+        return True
+
+    def _stored(self,name):
+        r"""
+        Returns the saved component ``name``, or None if it has not
+        been saved or no saved data has been loaded with
+        :meth:`load_data`.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(5,13)
+            sage: X.load_data(tmp_filename() + '.sobj')
+            False
+            sage: print X._stored(('hecke',7))
+            None
+        """
+        if self._store is None:
+            return None
+        try:
+            return loads(self._store[name])
+        except KeyError:
+            return None
+
     def _latex_(self):
         r"""
         Returns the LaTeX representation of self.
@@ -2066,6 +2323,12 @@ class BTQuotient(SageObject, UniqueRepresentation):
 
         - Matrices I, J, K giving the splitting.
 
+        The splitting is determined by a square root in `\ZZ_p`. When
+        the precision is raised, this square root is lifted from the
+        precision it is already known to, instead of being computed
+        again, so that the splitting at the new precision extends the
+        old one.
+
         EXAMPLES::
 
             sage: X = BTQuotient(11,3)
@@ -2073,11 +2336,40 @@ class BTQuotient(SageObject, UniqueRepresentation):
             sage: B.<i,j,k> = QuaternionAlgebra(3)
             sage: phi(i)**2 == QQ(i**2)*phi(B(1))
             True
+            sage: I,J,K = X._local_splitting(10)
+            sage: I2,J2,K2 = X._local_splitting(30)
+            sage: all([(J2[ii,jj]-J[ii,jj]).valuation() >= 10 for ii in range(2) for jj in range(2)])
+            True
+            sage: J2*J2 == J2.parent()(QQ(j**2))
+            True
         """
         assert self._use_magma == False
         if prec <= self._prec:
             return self._II,self._JJ,self._KK
 
+        try:
+            c,r,n,z=self._splitting_sqrt
+            if n < prec:
+                p=self._p
+                ZZp=Zp(p,prec)
+                M=MatrixSpace(ZZp,2)
+                v=self.get_quaternion_algebra().invariants()
+                a=ZZp(v[0])
+                b=ZZp(v[1])
+                r=_lift_square_root(c,r,p,n,prec)
+                self._splitting_sqrt=(c,r,prec,z)
+                x=ZZp(r)
+                if z is None:
+                    self._II=M([x,0,2*x,-x])
+                    self._JJ=M([b,-b,b-1,-b])
+                else:
+                    self._II=M([0,a,1,0])
+                    self._JJ=M([x,-a*z,z,-x])
+                self._KK=self._II*self._JJ
+            return self._II,self._JJ,self._KK
+        except AttributeError:
+            pass
+
         A=self.get_quaternion_algebra()
 
         ZZp=Zp(self._p,prec)
@@ -2094,6 +2386,7 @@ class BTQuotient(SageObject, UniqueRepresentation):
             alpha=a.sqrt()
             self._II=M([alpha,0,2*alpha,-alpha])
             self._JJ=M([b,-b,b-1,-b])
+            c,x,z=a,alpha,None
         else:
             self._II = M([0,a,1,0])
             z=0
@@ -2106,6 +2399,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
                 else:
                     z+=1
         self._KK = self._II*self._JJ
+        ## Newton's method only lifts square roots of units
+        if c.valuation() == 0:
+            self._splitting_sqrt=(ZZ(c.lift()),x.lift(),prec,z)
         return self._II, self._JJ, self._KK
 
     def _compute_embedding_matrix(self,prec, force_computation = False):
@@ -2280,6 +2576,16 @@ class BTQuotient(SageObject, UniqueRepresentation):
             except:
                 raise RuntimeError, 'Exact splitting not available.'
         else:
+            if self._prec < 0:
+                stored=self._stored('embedding')
+                if stored is not None:
+                    for name,value in stored.items():
+                        setattr(self,name,value)
+                    self._stored_prec=self._prec
+                    self._R=Qp(self._p,prec = self._prec)
+                    self._pN=self._p**self._prec
+                    self._Iotainv = self._Mat_44([self._Iotainv_lift[ii,jj]%self._pN for ii in range(4) for jj in range(4)])
+
             if prec is None:
                 prec = self._prec
 
@@ -2297,7 +2603,24 @@ class BTQuotient(SageObject, UniqueRepresentation):
             if prec > self._prec:
                 verbose('self._prec = %s, prec = %s'%(self._prec,prec))
                 Iotamod = self._compute_embedding_matrix(prec)
-                self._Iotainv_lift = Iotamod.inverse().lift()
+                if self._stored_prec > 0:
+                    ## The saved quotient is only valid for the embedding
+                    ## it was computed with
+                    pM=self._p**self._stored_prec
+                    if any([(Iotamod[ii,jj].lift()-self._Iota[ii,jj].lift())%pM != 0 for ii in range(4) for jj in range(4)]):
+                        raise RuntimeError, 'The embedding does not extend the saved one.'
+                if self._prec > 0 and hasattr(self,'_Iotainv_lift'):
+                    ## Lift the inverse from the old precision with
+                    ## Newton's iteration X -> X*(2 - A*X)
+                    A=Iotamod.lift()
+                    X=self._Iotainv_lift
+                    n=self._prec
+                    while n < prec:
+                        n=min(2*n,prec)
+                        X=(X*(2-A*X)).apply_map(lambda xx:xx%self._p**n)
+                    self._Iotainv_lift = X
+                else:
+                    self._Iotainv_lift = Iotamod.inverse().lift()
                 self._Iota = Matrix(self._R,4,4,[Iotamod[ii,jj] for ii in range(4) for jj in range(4)])
 
             self._prec = prec
@@ -2426,6 +2749,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
         """
         try: return self._edge_stabs
         except AttributeError:
+            self._edge_stabs=self._stored('edge_stabs')
+            if self._edge_stabs is not None:
+                return self._edge_stabs
             self._edge_stabs=[self._stabilizer(e.rep,as_edge=True) for e in self.get_edge_list()]
             return self._edge_stabs
 
@@ -2484,6 +2810,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
         """
         try: return self._vertex_stabs
         except AttributeError:
+            self._vertex_stabs=self._stored('vertex_stabs')
+            if self._vertex_stabs is not None:
+                return self._vertex_stabs
             self._vertex_stabs=[self._stabilizer(e.rep,as_edge=False) for e in self.get_vertex_list()]
             return self._vertex_stabs
 
@@ -2676,9 +3005,10 @@ class BTQuotient(SageObject, UniqueRepresentation):
             ]
         """
         OM=self.get_eichler_order_quadmatrix()
-        v=pari('qfminim(%s,2,0, flag = 0)'%(OM._pari_()))
+        OMpari=OM._pari_()
+        v=OMpari.qfminim(2,0,0)
         n_units=Integer(v[0].python()/2)
-        v=pari('qfminim(%s,2,%s, flag = 2)'%((OM._pari_()),n_units))
+        v=OMpari.qfminim(2,n_units,2)
         O_units=[]
         for jj in range(n_units):
             vec=Matrix(ZZ,4,1,[v[2][ii,jj].python() for ii in range(4)])
@@ -2799,6 +3129,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
             [   1    0], [DoubleCosetReduction, DoubleCosetReduction, DoubleCosetReduction, DoubleCosetReduction]], [[-2/3  1/3]
             [   1    0], [DoubleCosetReduction, DoubleCosetReduction, DoubleCosetReduction, DoubleCosetReduction]]]
         """
+        stored=self._stored('Up')
+        if stored is not None:
+            return stored
         E=self.get_edge_list()
         vec_a=self._BT.subdivide([1],1)
         return [[alpha.inverse(),[DoubleCosetReduction(self,e.rep*alpha) for e in E]+[DoubleCosetReduction(self,e.opposite.rep*alpha) for e in E]] for alpha in vec_a]
@@ -2824,6 +3157,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
             [-2], [DoubleCosetReduction, DoubleCosetReduction]
             ]
         """
+        stored=self._stored(('atkin_lehner',q))
+        if stored is not None:
+            return stored
         E=self.get_edge_list()
         # self._increase_precision(20)
 
@@ -2861,8 +3197,13 @@ class BTQuotient(SageObject, UniqueRepresentation):
             sage: X = BTQuotient(3,17)
             sage: len(X._get_hecke_data(5))
             2
+            sage: len(X._get_hecke_data(11)[0])
+            12
         """
         # print 'Getting hecke data for prime ',l,'...'
+        stored=self._stored(('hecke',l))
+        if stored is not None:
+            return stored
         def enumerate_words(v):
             n=[]
             while True:
@@ -2901,19 +3242,35 @@ class BTQuotient(SageObject, UniqueRepresentation):
         alphamat = self.embed_quaternion(alpha)
         letters = self.get_generators() + filter(lambda g:prod([self._character(ZZ((v*Matrix(ZZ,4,1,g))[0,0]))/self._character((p**ZZ(nninc/2))) for v in self.get_extra_embedding_matrices()]) == 1, self._find_elements_in_order(1))
         I=enumerate_words([self._conv(x) for x in letters])
+        if len(Sset) > 0:
+            ## The candidates v0 and tt give the same coset when
+            ## v0^(-1)*tt is integral away from p (the old test
+            ## is_S_integral([p])), that is, when the right ideals
+            ## v0*R+l*R and tt*R+l*R coincide. The Hermite normal form
+            ## of these ideals identifies the cosets.
+            OBasis=self.get_eichler_order_basis()
+            lR=Matrix(ZZ,4,4,l)
+            def coset_key(v0):
+                M=Matrix(ZZ,4,4,[(BB*Matrix(QQ,4,1,(v0*b).coefficient_tuple())).list() for b in OBasis]).stack(lR)
+                return tuple(M.echelon_form().list()[:16])
+            seen=set([])
         n_iters = 0
         while len(T)<l+1: # or n_iters < 200:
             n_iters += 1
             v = I.next()
             v0 = v*alpha0
-            vinv = self.get_quaternion_algebra()(v0**(-1))
-            new = True
-            for tt in T0:
-                r = vinv*tt
-                r_in_order = BB*Matrix(QQ,4,1,r.coefficient_tuple())
-                if all([a.is_S_integral(Sset) for a in r_in_order.list()]):
-                    new = False
-                    break
+            if len(Sset) > 0:
+                key = coset_key(v0)
+                new = key not in seen
+            else:
+                vinv = self.get_quaternion_algebra()(v0**(-1))
+                new = True
+                for tt in T0:
+                    r = vinv*tt
+                    r_in_order = BB*Matrix(QQ,4,1,r.coefficient_tuple())
+                    if all([a.is_S_integral(Sset) for a in r_in_order.list()]):
+                        new = False
+                        break
             if new:
                 v1 = BB*Matrix(QQ,4,1,v.coefficient_tuple())
                 success = False
@@ -2927,6 +3284,8 @@ class BTQuotient(SageObject, UniqueRepresentation):
                         self._increase_precision(10)
                         alphamat = self.embed_quaternion(alpha)
                 T0.append(v0)
+                if len(Sset) > 0:
+                    seen.add(key)
         assert len(T) == l+1
         return T,alpha
 
@@ -2966,16 +3325,19 @@ class BTQuotient(SageObject, UniqueRepresentation):
         try:
             return self._cached_vertices[v0]
         except KeyError: pass
-        if V is None:
-            V=self._vertex_list
         if valuation is None:
             valuation=v0.determinant().valuation(self._p)
+        if V is None:
+            if self._vertex_buckets is None:
+                V=self._vertex_list
+            else:
+                V=self._vertex_buckets.get(self._fingerprint(v0,False,valuation),[])
         parity=valuation%2
-        for v in filter(lambda v:v.parity==parity,V):
-            g=self._are_equivalent(v0,v.rep,False,valuation+v.valuation)
-            if g is not None:
-                self._cached_vertices[v0]=(g,v)
-                return g,v
+        V=filter(lambda v:v.parity==parity,V)
+        i,g=self._are_equivalent_batch([(v0,v.rep,valuation+v.valuation) for v in V],False)
+        if g is not None:
+            self._cached_vertices[v0]=(g,V[i])
+            return g,V[i]
         return 0,None
 
     def _find_equivalent_edge(self,e0,E=None,valuation=None):
@@ -3022,11 +3384,11 @@ class BTQuotient(SageObject, UniqueRepresentation):
                 E=self._edge_list
             else:
                 E=[e.opposite for e in self._edge_list]
-        for e in filter(lambda x:x.parity==parity,E):
-            g = self._are_equivalent(e.rep,e0,True,valuation+e.valuation)
-            if g is not None:
-                self._cached_edges[e0]=(g,e)
-                return g,e
+        E=filter(lambda x:x.parity==parity,E)
+        i,g=self._are_equivalent_batch([(e.rep,e0,valuation+e.valuation) for e in E],True)
+        if g is not None:
+            self._cached_edges[e0]=(g,E[i])
+            return g,E[i]
         return 0,None
 
     def fundom_rep(self,v1):
@@ -3108,6 +3470,61 @@ class BTQuotient(SageObject, UniqueRepresentation):
         Et = E.transpose()
         return Et,E*self.get_eichler_order_quadmatrix()*Et
 
+    def _fingerprint(self,v,as_edges=False,valuation=None):
+        r"""
+        Computes an invariant of ``v`` under the arithmetic group.
+
+        The lattice attached to the pair (``v``, ``v``) is the order
+        of the elements stabilizing ``v``, scaled by `p^m` where `m`
+        is the valuation of the determinant of ``v``. If `g\cdot v=w`
+        then conjugation by `g` is an isometry between the orders
+        attached to ``v`` and ``w``, so the number of vectors of
+        small norm in the scaled lattice does not depend on the
+        representative. Equivalent vertices (or edges) therefore
+        have the same fingerprint, and only those sharing a
+        fingerprint need to be compared with :meth:`_are_equivalent`.
+
+        INPUT:
+
+        - ``v`` - an immutable 2x2 integral matrix representing a
+          vertex or an edge.
+
+        - ``as_edges`` - boolean (Default: False). Tells whether
+          ``v`` is an edge.
+
+        - ``valuation`` - an integer (Default: None): The valuation
+          of the determinant of ``v``, if known (otherwise it is
+          calculated).
+
+        OUTPUT:
+
+        A tuple of integers: the parity of ``v`` followed by the
+        number of vectors in the lattice whose reduced norm is at most
+        `np^{2m}`, for `n = 1, 2, 3`.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(3,7)
+            sage: M = Matrix(ZZ,2,2,[1,3,2,7])
+            sage: M.set_immutable()
+            sage: X._fingerprint(M) == X._fingerprint(X._find_equivalent_vertex(M)[1].rep)
+            True
+        """
+        try:
+            return self._cached_fingerprints[(v,as_edges)]
+        except KeyError: pass
+        p=self._p
+        if valuation is None:
+            valuation=v.determinant().valuation(p)
+        twom=2*valuation
+        E,A = self._find_lattice(v,v,as_edges,twom)
+        Apari = A._pari_()
+        ## Only the number of vectors is asked for, so none is stored
+        counts = [ZZ(Apari.qfminim(2*n*p**twom,0,0)[0]) for n in range(1,4)]
+        fp = tuple([valuation%2]+counts)
+        self._cached_fingerprints[(v,as_edges)]=fp
+        return fp
+
     def _stabilizer(self,e,as_edge=True):
         r"""
         Finds the stabilizer of an edge or vertex.
@@ -3140,7 +3557,7 @@ class BTQuotient(SageObject, UniqueRepresentation):
         n_units=len(self.get_units_of_order())
         ## Using PARI to get the shortest vector in the lattice (via LLL)
         ## We used to pass qfminim flag = 2
-        mat = pari('qfminim(%s,0,%s)'%(A._pari_(),2*n_units))[2].python().transpose()
+        mat = A._pari_().qfminim(0,2*n_units,0)[2].python().transpose()
         n_vecs=mat.nrows()
         stabs=[]
         for jj in range(n_vecs):
@@ -3206,7 +3623,7 @@ class BTQuotient(SageObject, UniqueRepresentation):
         if self._use_magma == False or len(self._extra_level) == 0:
             return E*vec, True
         m = ZZ(twom/2)
-        mat = pari('qfminim(%s,0,%s,flag = %s)'%(A._pari_(),1000,flag))[2].python().transpose()
+        mat = A._pari_().qfminim(0,1000,flag)[2].python().transpose()
         n_vecs = mat.nrows()
         p = self._p
         for jj in range(n_vecs):
@@ -3285,12 +3702,13 @@ class BTQuotient(SageObject, UniqueRepresentation):
                 self._cached_equivalent[(v1,v2,as_edges)]=None
                 return None
         E,A=self._find_lattice(v1,v2,as_edges,twom)
-        ## Using PARI to get the shortest vector in the lattice (via LLL)
-        vec=pari('qfminim(%s,0,1,flag = 0)'%(A._pari_()))[2].python()
-
-        vect=vec.transpose()
-        nrd=Integer((vect*A*vec)[0,0]/2)
-        if nrd == p**twom:
+        ## Using PARI to get the shortest vector in the lattice (via LLL).
+        ## The norm of the lattice vectors is divisible by p**twom, so
+        ## the pair is equivalent if and only if the minimum is p**twom
+        ## (up to the nebentype condition).
+        res=A._pari_().qfminim(0,1,0)
+        if Integer(res[1]) == 2*p**twom:
+            vec=res[2].python()
             g, ans = self._nebentype_check(vec, twom, E,A)
             if ans == True:
                 m=Integer(twom/2)
@@ -3300,6 +3718,88 @@ class BTQuotient(SageObject, UniqueRepresentation):
         self._cached_equivalent[(v1,v2,as_edges)]=None
         return None
 
+    def _are_equivalent_batch(self,pairs,as_edges=False):
+        r"""
+        Finds an equivalent pair among several pairs of vertices (or
+        edges) of the Bruhat-Tits tree.
+
+        The lattices attached to the pairs are scaled so that an
+        equivalence corresponds to the same norm in all of them, and
+        are searched for short vectors in a single call to PARI, as
+        blocks of one quadratic form. The individual test
+        :meth:`_are_equivalent` is then only run on the block in which
+        the short vector lies.
+
+        INPUT:
+
+        - ``pairs`` - a list of triples ``(v1, v2, twom)`` as in the
+          arguments of :meth:`_are_equivalent`. The integers ``twom``
+          must be even.
+
+        - ``as_edges`` - boolean (Default: False). Tells whether the
+          matrices should be interpreted as edges (if true), or as
+          vertices (if false)
+
+        OUTPUT:
+
+        A pair ``i``, ``(g, m)`` where ``i`` is the index of a pair which
+        is equivalent and ``(g, m)`` is returned by
+        :meth:`_are_equivalent` for it, or ``None``, ``None`` if no
+        pair is equivalent.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(7,5)
+            sage: M1 = Matrix(ZZ,2,2,[88,3,1,1]); M1.set_immutable()
+            sage: M2 = Matrix(ZZ,2,2,[1,2,8,1]); M2.set_immutable()
+            sage: X._are_equivalent_batch([(M1,M2,0)],as_edges=True)
+            (None, None)
+            sage: i, g = X._are_equivalent_batch([(M1,M2,0),(M1,M1,0)])
+            sage: g == X._are_equivalent(M1,M1)
+            True
+        """
+        p=self._p
+        todo=[]
+        for i,(v1,v2,twom) in enumerate(pairs):
+            try:
+                g=self._cached_equivalent[(v1,v2,as_edges)]
+                if g is not None:
+                    return i,g
+            except KeyError:
+                todo.append(i)
+        ## Keep the quadratic forms small enough for the enumeration
+        chunk_size=8
+        for start in range(0,len(todo),chunk_size):
+            chunk=todo[start:start+chunk_size]
+            if len(chunk) == 1:
+                v1,v2,twom=pairs[chunk[0]]
+                g=self._are_equivalent(v1,v2,as_edges,twom)
+                if g is not None:
+                    return chunk[0],g
+                continue
+            twoms=[pairs[i][2] for i in chunk]
+            top=max(twoms)
+            blocks=[]
+            for i in chunk:
+                v1,v2,twom=pairs[i]
+                E,A=self._find_lattice(v1,v2,as_edges,twom)
+                blocks.append(p**(top-twom)*A)
+            res=block_diagonal_matrix(blocks)._pari_().qfminim(0,1,0)
+            if Integer(res[1]) != 2*p**top:
+                for i in chunk:
+                    v1,v2,twom=pairs[i]
+                    self._cached_equivalent[(v1,v2,as_edges)]=None
+                continue
+            ## The minimal vectors of an orthogonal sum lie in one block
+            vec=res[2].python().list()
+            first=[jj for jj in range(len(chunk)) if any(vec[4*jj:4*jj+4])][0]
+            for jj in [first]+range(first)+range(first+1,len(chunk)):
+                v1,v2,twom=pairs[chunk[jj]]
+                g=self._are_equivalent(v1,v2,as_edges,twom)
+                if g is not None:
+                    return chunk[jj],g
+        return None,None
+
     def _compute_exact_splitting(self):
         r"""
         Uses Magma to calculate a splitting of the order into
@@ -3503,6 +4003,11 @@ class BTQuotient(SageObject, UniqueRepresentation):
         - Cameron Franc (2012-02-20)
         - Marc Masdeu
         """
+        stored=self._stored('quotient')
+        if stored is not None:
+            for name,value in stored.items():
+                setattr(self,name,value)
+            return
         generators=set([])
         genus=self.genus()
         num_verts=0
@@ -3512,6 +4017,8 @@ class BTQuotient(SageObject, UniqueRepresentation):
         p=self._p
         v0=Vertex(p,num_verts,self._Mat_22([1,0,0,1]),determinant = 1,valuation = 0)
         V=collections.deque([v0])
+        # The pending vertices, bucketed by fingerprint
+        buckets={self._fingerprint(v0.rep,False,0):[v0]}
         S=Graph(0,multiedges=True,weighted=True)
         Sfun = Graph(0)
         edge_list=[]
@@ -3522,6 +4029,7 @@ class BTQuotient(SageObject, UniqueRepresentation):
         total_edges = genus + total_verts -1
         while len(V)>0:
             v=V.popleft()
+            buckets[self._fingerprint(v.rep,False,v.valuation)].remove(v)
             E=self._BT.leaving_edges(v.rep)
 
             # print 'V = %s, E = %s, G = %s (target = %s), lenV = %s'%(num_verts,num_edges,1+num_edges-num_verts,genus,len(V))
@@ -3546,7 +4054,8 @@ class BTQuotient(SageObject, UniqueRepresentation):
                     new_det=target.determinant()
                     new_valuation=new_det.valuation(p)
                     new_parity=new_valuation%2
-                    g1,v1=self._find_equivalent_vertex(target,V,valuation=new_valuation)
+                    fp=self._fingerprint(target,False,new_valuation)
+                    g1,v1=self._find_equivalent_vertex(target,buckets.setdefault(fp,[]),valuation=new_valuation)
                     if v1 is None:
                         #The vertex is also new
                         v1=Vertex(p,num_verts,target,determinant = new_det,valuation = new_valuation)
@@ -3554,6 +4063,7 @@ class BTQuotient(SageObject, UniqueRepresentation):
                         num_verts+=1
                         #Add the vertex to the list of pending vertices
                         V.append(v1)
+                        buckets[fp].append(v1)
                     else:
                         generators.add(g1[0])
 
@@ -3598,6 +4108,9 @@ class BTQuotient(SageObject, UniqueRepresentation):
         self._boundary = dict([(v.rep,v) for v in vertex_list])
         self._edge_list = edge_list
         self._vertex_list = vertex_list
+        self._vertex_buckets = dict()
+        for v in vertex_list:
+            self._vertex_buckets.setdefault(self._fingerprint(v.rep,False,v.valuation),[]).append(v)
         self._num_edges = num_edges
         self._S = S
         self._Sfun = Sfun
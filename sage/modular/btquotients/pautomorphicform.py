@@ -14,7 +14,7 @@ from sage.modules.module import Module
 from sage.rings.all import Integer
 from sage.structure.element import Element
 from sage.matrix.constructor import Matrix, zero_matrix
-from sage.rings.all import Qp
+from sage.rings.all import Qp, Zmod, GF
 from sage.rings.all import RationalField
 from sage.rings.number_field.all import NumberField
 from copy import copy
@@ -95,6 +95,98 @@ def eval_dist_at_powseries(phi,f):
     else:
         return phi.evaluate_at_poly(f)
 
+def _dist_moments(phi):
+    r"""
+    Returns the list of moments of the distribution ``phi``.
+
+    EXAMPLES::
+
+        sage: from sage.modular.btquotients.pautomorphicform import _dist_moments
+        sage: X = BTQuotient(3,7)
+        sage: H = HarmonicCocycles(X,4,prec=10)
+        sage: phi = H.basis()[0].evaluate(X.get_edge_list()[0].rep)
+        sage: len(_dist_moments(phi))
+        3
+    """
+    if use_ps_dists:
+        return list(phi._moments)
+    else:
+        return [phi.moment(ii) for ii in range(phi._depth)]
+
+def _poisson_kernel_values(BT,edge_moments,n,points,level = 0):
+    r"""
+    Integrates the Poisson kernel at each of the given points against
+    a measure, which is described by the moments of its restriction
+    to each ball of `\PP^1(\QQ_p)`.
+
+    Each point is integrated over the covering by balls attached to
+    the affinoid containing it, so the covering is computed once for
+    all the points in the same affinoid, as are the moments on each
+    ball. On the ball corresponding to an edge `e =
+    \begin{pmatrix}a&b\\c&d\end{pmatrix}` the integrand is
+
+    .. MATH::
+
+        \frac{(cx+d)^{n+1}\det(e)^{-n/2}}{(b-dz)+(a-cz)x} =
+        \frac{\det(e)^{-n/2}}{b-dz} (cx+d)^{n+1} \sum_{k\geq 0} w^k x^k,\qquad w = -\frac{a-cz}{b-dz}.
+
+    Convolving the moments with the coefficients of `(cx+d)^{n+1}`
+    gives moments that do not depend on `z`, and the integral is a
+    polynomial in `w` which is evaluated for all the points at once.
+
+    INPUT:
+
+    - ``BT`` - the Bruhat-Tits tree.
+
+    - ``edge_moments`` - a function taking the matrix of an edge to
+      the list of moments on the corresponding ball.
+
+    - ``n`` - an integer. The weight of the coefficient module.
+
+    - ``points`` - a list of points in the `p`-adic upper half plane.
+
+    - ``level`` - an integer (Default = 0). How much to subdivide
+      the coverings.
+
+    OUTPUT:
+
+    The list of the integrals at each of the points.
+
+    EXAMPLES::
+
+        sage: from sage.modular.btquotients.pautomorphicform import _poisson_kernel_values, _dist_moments
+        sage: X = BTQuotient(3,23)
+        sage: H = HarmonicCocycles(X,2,prec = 8)
+        sage: b = H.basis()[0]
+        sage: R.<a> = Qq(9,prec=10)
+        sage: _poisson_kernel_values(X._BT,lambda e:_dist_moments(b.evaluate(e)),0,[a])[0] == b.riemann_sum(1/(PolynomialRing(R,'x').gen()-a),X._BT.find_containing_affinoid(a))
+        True
+    """
+    groups = dict()
+    for ii,z in enumerate(points):
+        center = copy(BT.find_containing_affinoid(z))
+        center.set_immutable()
+        groups.setdefault(center,[]).append(ii)
+    values = [0 for z in points]
+    binoms = [arith.binomial(n+1,ii) for ii in range(n+2)]
+    for center,indices in groups.iteritems():
+        zz = [points[ii] for ii in indices]
+        for e in BT.get_balls(center,level):
+            a,b,c,d = e.list()
+            m = edge_moments(e)
+            nmoments = len(m)
+            poly = [binoms[ii]*c**ii*d**(n+1-ii) for ii in range(n+2)]
+            shifted = [sum([poly[ii]*m[kk+ii] for ii in range(min([n+2,nmoments-kk]))]) for kk in range(nmoments)]
+            delta = e.determinant()**-ZZ(n/2)
+            dens = [b-d*z for z in zz]
+            ws = [(c*z-a)/den for z,den in izip(zz,dens)]
+            acc = [0 for z in zz]
+            for mk in reversed(shifted):
+                acc = [t*w+mk for t,w in izip(acc,ws)]
+            for ii,t,den in izip(indices,acc,dens):
+                values[ii] += delta*t/den
+    return values
+
 # Need this to be pickleable
 class _btquot_adjuster(Sigma0ActionAdjuster):
     """
@@ -494,6 +586,11 @@ class HarmonicCocycleElement(HeckeModuleElement):
 
         If z = None, a function is returned that encodes the modular form.
 
+        If z is a list of points, the list of values at these points
+        is returned. The coverings of `\PP^1(\QQ_p)` and the values
+        of self on their balls are then computed only once for all
+        the points.
+
         NOTE: This function uses the integration method of Riemann
         summation and is incredibly slow! It should only be used for
         testing and bug-finding. Overconvergent methods are quicker.
@@ -501,7 +598,8 @@ class HarmonicCocycleElement(HeckeModuleElement):
         INPUT:
 
         - `z` - an element in the quadratic unramified extension of
-          `\Qp` that is not contained in `\Qp` (Default = None).
+          `\Qp` that is not contained in `\Qp`, or a list of such
+          elements (Default = None).
 
         - `level` - an integer. How fine of a mesh should the Riemann
           sum use.
@@ -526,7 +624,16 @@ class HarmonicCocycleElement(HeckeModuleElement):
             a + (a + 2)*3 + (2*a + 2)*3^2 + (2*a + 2)*3^3 + 2*a*3^5 + a*3^6 + O(3^7)
             sage: (x4-x3).valuation()
             3
+            sage: b.modular_form([a,a+3],level = 1) == [x2,b.modular_form(a+3,level = 1)]
+            True
         """
+        if isinstance(z,(list,tuple)):
+            k = self.parent()._k
+            if use_ps_dists:
+                edge_moments = lambda e:_dist_moments(self.parent()._Sigma0(e.inverse(),check = False) * self.evaluate(e))
+            else:
+                edge_moments = lambda e:_dist_moments(self.evaluate(e).l_act_by(e.inverse()))
+            return _poisson_kernel_values(self.parent()._X._BT,edge_moments,k-2,list(z),level)
         return self.derivative(z,level,order = 0)
 
     # In HarmonicCocycle
@@ -1127,7 +1234,9 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
             v = stab_conds[kk]
             self._M.set_block((nV+kk)*d,v[0]*d,v[1])
 
-        x1 = self._M.right_kernel().matrix()
+        x1 = self.__lifted_kernel()
+        if x1 is None:
+            x1 = self._M.right_kernel().matrix()
 
         if x1.nrows() !=  self.rank():
             raise RuntimeError, 'The computed dimension does not agree with the expectation. Consider increasing precision!'
@@ -1144,102 +1253,92 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
         self.__matrix.set_immutable()
         return self.__matrix
 
-    def __apply_atkin_lehner(self,q,f):
+    def __lifted_kernel(self):
         r"""
-        Applies an Atkin-Lehner involution to a harmonic cocycle
-
-        INPUT:
-
-        - ``q`` - an integer dividing the full level p*Nminus*Nplus
-
-        - ``f`` - a harmonic cocycle
+        Computes the right kernel of the matrix ``self._M`` of
+        conditions defining the cocycles, by reducing modulo `p` and
+        lifting, when the coefficients are `p`-adic.
+
+        The matrix is scaled to have integral entries. Pivot rows and
+        columns are found modulo `p`. If the kernel modulo `p` has the
+        expected dimension, the square submatrix they give is
+        invertible over `\ZZ_p`. Its inverse is lifted to the working
+        precision by Newton's iteration, and it determines the
+        kernel. The pivots and the lifted inverse are stored in the
+        BTQuotient under the weight and the coefficient ring, and are
+        reused only if the stored inverse is still an inverse of the
+        new pivot minor modulo the precision it was lifted to.
 
         OUTPUT:
 
-        - The harmonic cocycle obtained by hitting f with the
-          Atkin-Lehner at q
+        A matrix whose rows, in echelon form, span the kernel, or None
+        if the coefficients are exact or the reduction modulo `p` of
+        the conditions has the wrong rank. In these cases the kernel
+        has to be computed directly.
 
         EXAMPLES::
 
-            sage: X = BTQuotient(5,17)
-            sage: H = HarmonicCocycles(X,2,prec = 10)
-            sage: A = H.atkin_lehner_operator(5).matrix() # indirect doctest
-            sage: A**2 == 1
+            sage: X = BTQuotient(5,3)
+            sage: M = HarmonicCocycles(X,4,prec = 20)
+            sage: B = M.basis_matrix() # indirect doctest
+            sage: (M._M * B.transpose()).is_zero()
+            True
+            sage: M2 = HarmonicCocycles(X,4,prec = 30)
+            sage: M2.basis_matrix().change_ring(M.base_ring()) == B
             True
-
-        """
-        R = self._R
-        Data = self._X._get_atkin_lehner_data(q)
-        p = self._X._p
-        tmp = [self._U(0) for jj in range(len(self._E))]
-        d1 = Data[1]
-        mga = self.embed_quaternion(Data[0])
-        nE = len(self._E)
-        for jj in range(nE):
-            t = d1[jj]
-            if t.label < nE:
-                if use_ps_dists:
-                    tmp[jj] += mga * t.igamma(self.embed_quaternion, scale = p**-t.power) * f._F[t.label]
-                else:
-                    tmp[jj] += (f._F[t.label]).l_act_by(p**(-t.power)*mga*t.igamma(self.embed_quaternion))
-            else:
-                if use_ps_dists:
-                    tmp[jj] += mga * t.igamma(self.embed_quaternion, scale = p**-t.power) * (-f._F[t.label-nE])
-                else:
-                    tmp[jj] += (-f._F[t.label-nE]).l_act_by(p**(-t.power)*mga*t.igamma(self.embed_quaternion))
-
-        return self(tmp)
-
-    def __apply_hecke_operator(self,l,f):
-        r"""
-        This function applies a Hecke operator to a harmonic cocycle.
-
-        INPUT:
-
-        - ``l`` - an integer
-
-        - ``f`` - a harmonic cocycle
-
-        OUTPUT:
-
-        - A harmonic cocycle which is the result of applying the lth
-          Hecke operator to f
-
-        EXAMPLES::
-
-            sage: X = BTQuotient(5,17)
-            sage: H = HarmonicCocycles(X,2,prec=50)
-            sage: A = H.hecke_operator(7).matrix() # indirect doctest
-            sage: print [o.rational_reconstruction() for o in A.charpoly().coefficients()]
-            [-8, -12, 12, 20, 8, 1]
-
         """
-        R = self._R
-        HeckeData,alpha = self._X._get_hecke_data(l)
-        if(self.level()%l == 0):
-            factor = QQ(l**(Integer((self._k-2)/2))/(l+1))
-        else:
-            factor = QQ(l**(Integer((self._k-2)/2)))
+        if self._R.is_exact():
+            return None
         p = self._X._p
-        alphamat = self.embed_quaternion(alpha)
-        tmp = [self._U(0) for jj in range(len(self._E))]
-        for ii in range(len(HeckeData)):
-            d1 = HeckeData[ii][1]
-            mga = self.embed_quaternion(HeckeData[ii][0])*alphamat
-            nE = len(self._E)
-            for jj in range(nE):
-                t = d1[jj]
-                if t.label < nE:
-                    if use_ps_dists:
-                        tmp[jj] += mga * t.igamma(self.embed_quaternion,scale = p**-t.power) * f._F[t.label]
-                    else:
-                        tmp[jj] += f._F[t.label].l_act_by(p**(-t.power)*mga*t.igamma(self.embed_quaternion))
-                else:
-                    if use_ps_dists:
-                        tmp[jj] += mga * t.igamma(self.embed_quaternion,scale = p**-t.power) * (-f._F[t.label-nE])
-                    else:
-                        tmp[jj] += (-f._F[t.label-nE]).l_act_by(p**(-t.power)*mga*t.igamma(self.embed_quaternion))
-        return self([factor*x for x in tmp])
+        N = self._R.precision_cap()
+        A = self._M
+        entries = A.dict()
+        if len(entries) == 0:
+            return None
+        s = min([a.valuation() for a in entries.values()]+[0])
+        ZpN = Zmod(p**N)
+        Aint = dict([(ij,ZpN(QQ(p**(-s)*a))) for ij,a in entries.iteritems()])
+        ncols = A.ncols()
+        kernel_data = self._X._cached_kernel_data
+        key = (self._k,self._R)
+        try:
+            pivots,rows,X,n = kernel_data[key]
+            r = len(pivots)
+            AR = Matrix(ZpN,A.nrows(),ncols,Aint,sparse = True).matrix_from_rows(rows)
+            APR = AR.matrix_from_columns(pivots).change_ring(ZZ)
+            E = APR*X - 1
+            if not E.change_ring(GF(p)).is_zero():
+                raise KeyError
+            ## The stored inverse may only be lifted further if the
+            ## pivot minor is unchanged modulo p^n; otherwise restart
+            ## Newton's iteration from the inverse modulo p.
+            if not E.apply_map(lambda xx:xx%p**n).is_zero():
+                X = X.apply_map(lambda xx:xx%p)
+                n = 1
+        except KeyError:
+            Ap = Matrix(GF(p),A.nrows(),ncols,dict([(ij,a.lift()) for ij,a in Aint.iteritems()]),sparse = True)
+            pivots = list(Ap.pivots())
+            r = len(pivots)
+            if ncols - r != self.rank():
+                return None
+            rows = list(Ap.pivot_rows())
+            AR = Matrix(ZpN,A.nrows(),ncols,Aint,sparse = True).matrix_from_rows(rows)
+            APR = AR.matrix_from_columns(pivots).change_ring(ZZ)
+            X = APR.change_ring(GF(p)).inverse().change_ring(ZZ)
+            n = 1
+        ## Newton's iteration for the inverse, X -> X*(2-APR*X)
+        while n < N:
+            n = min([2*n,N])
+            X = (X*(2-APR*X)).apply_map(lambda xx:xx%p**n)
+        kernel_data[key] = (pivots,rows,X,n)
+        free = [jj for jj in range(ncols) if jj not in pivots]
+        xP = -X.change_ring(ZpN)*AR.matrix_from_columns(free)
+        K = Matrix(self._R,len(free),ncols,0)
+        for ii in range(len(free)):
+            K[ii,free[ii]] = 1
+            for jj in range(r):
+                K[ii,pivots[jj]] = xP[jj,ii].lift()
+        return K.echelon_form()
 
     def _compute_atkin_lehner_matrix(self,d):
         r"""
@@ -1265,7 +1364,7 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
             sage: A**2 == 1
             True
         """
-        res = self.__compute_operator_matrix(lambda f:self.__apply_atkin_lehner(d,f))
+        res = self.__compute_operator_matrix(self._edge_operator_matrix('AL',d))
         return res
 
     def _compute_hecke_matrix_prime(self,l):
@@ -1291,9 +1390,168 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
             sage: print [o.rational_reconstruction() for o in A.charpoly().coefficients()] # long time
             [6496256, 1497856, -109040, -33600, -904, 32, 1]
         """
-        res = self.__compute_operator_matrix(lambda f:self.__apply_hecke_operator(l,f))
+        res = self.__compute_operator_matrix(self._edge_operator_matrix('T',l))
         return res
 
+    def _edge_operator_matrix(self,kind,l):
+        r"""
+        Returns the matrix of a Hecke operator or of an Atkin-Lehner
+        involution on the space of all functions from the edges of
+        the fundamental domain to the coefficient module.
+
+        The matrix is assembled, from the double coset reductions
+        stored by the BTQuotient, as a sparse matrix with one `(k-1)
+        \times (k-1)` block for each pair of edges related by the
+        operator. It acts on column vectors which concatenate the
+        moments of the values at each edge, and it is computed only
+        once for each operator.
+
+        INPUT:
+
+        - ``kind`` - either ``'T'`` (a Hecke operator) or ``'AL'`` (an
+          Atkin-Lehner involution).
+
+        - ``l`` - a prime for ``'T'``, or a divisor of the level for
+          ``'AL'``.
+
+        OUTPUT:
+
+        A sparse square matrix of size `n_E(k-1)`, where `n_E` is the
+        number of edges in the fundamental domain.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(3,17)
+            sage: H = HarmonicCocycles(X,2,prec=10)
+            sage: T = H._edge_operator_matrix('T',5)
+            sage: T.is_sparse(), T.nrows() == len(X.get_edge_list())
+            (True, True)
+            sage: A = H.basis_matrix().transpose()
+            sage: f = H.basis()[0]
+            sage: g = H.hecke_operator(5)(f)
+            sage: T*A.column(0) == A*g.element()
+            True
+        """
+        try:
+            return self.__edge_operators[(kind,l)]
+        except AttributeError:
+            self.__edge_operators = dict()
+        except KeyError: pass
+        d = self._k-1
+        nE = len(self._E)
+        factor,blocks = self._acting_data(kind,l)
+        M = Matrix(self._R,nE*d,nE*d,0,sparse = True)
+        for (jj,ee),C in blocks.iteritems():
+            M.set_block(jj*d,ee*d,factor*C)
+        M.set_immutable()
+        self.__edge_operators[(kind,l)] = M
+        return M
+
+    def _acting_data(self,kind,l):
+        r"""
+        Returns the acting matrices of a Hecke operator or of an
+        Atkin-Lehner involution, one for each pair of edges related
+        by the operator.
+
+        They only depend on the quotient, the operator, the weight
+        and the coefficient ring (hence the precision), so they are
+        stored in the BTQuotient, next to the double coset reductions
+        they are computed from, and shared by all the spaces of
+        cocycles with the same weight and coefficients.
+
+        INPUT:
+
+        - ``kind`` - either ``'T'`` (a Hecke operator) or ``'AL'`` (an
+          Atkin-Lehner involution).
+
+        - ``l`` - a prime for ``'T'``, or a divisor of the level for
+          ``'AL'``.
+
+        OUTPUT:
+
+        A pair ``factor``, ``blocks``, where ``blocks`` is a
+        dictionary mapping a pair of labels of edges ``(jj,ee)`` to the
+        matrix by which the moments of the value at ``ee`` contribute
+        to the value at ``jj``, before multiplying by ``factor``.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(3,17)
+            sage: H = HarmonicCocycles(X,2,prec=10)
+            sage: factor,blocks = H._acting_data('T',5)
+            sage: factor
+            1
+            sage: H._acting_data('T',5)[1] is blocks
+            True
+        """
+        key = (kind,l,self._k,self._R)
+        try:
+            return self._X._cached_acting_matrices[key]
+        except KeyError: pass
+        p = self._X._p
+        d = self._k-1
+        nE = len(self._E)
+        if kind == 'T':
+            HeckeData,alpha = self._X._get_hecke_data(l)
+            if(self.level()%l == 0):
+                factor = QQ(l**(Integer((self._k-2)/2))/(l+1))
+            else:
+                factor = QQ(l**(Integer((self._k-2)/2)))
+            alphamat = self.embed_quaternion(alpha)
+            Data = [(self.embed_quaternion(HeckeData[ii][0])*alphamat,HeckeData[ii][1]) for ii in range(len(HeckeData))]
+        elif kind == 'AL':
+            ALData = self._X._get_atkin_lehner_data(l)
+            factor = 1
+            Data = [(self.embed_quaternion(ALData[0]),ALData[1])]
+        else:
+            raise ValueError, "kind must be either 'T' or 'AL'"
+        blocks = dict()
+        for mga,d1 in Data:
+            for jj in range(nE):
+                t = d1[jj]
+                if use_ps_dists:
+                    g = mga * t.igamma(self.embed_quaternion,scale = p**-t.power)
+                else:
+                    g = p**(-t.power)*mga*t.igamma(self.embed_quaternion)
+                C = self._U.acting_matrix(g,d).transpose()
+                if t.label < nE:
+                    edges = (jj,t.label)
+                else:
+                    edges = (jj,t.label-nE)
+                    C = -C
+                try:
+                    blocks[edges] += C
+                except KeyError:
+                    blocks[edges] = C
+        self._X._cached_acting_matrices[key] = (factor,blocks)
+        return factor,blocks
+
+    def __restriction_data(self):
+        r"""
+        Returns the data used to restrict operators on functions on
+        the edges to the space of cocycles.
+
+        A cocycle is determined by the entries of its vector of
+        moments at the pivots of the basis matrix. The data returned
+        is the list of these pivots, together with the inverse of the
+        square submatrix of the basis matrix given by them, which is
+        a left inverse of the transpose of the basis matrix.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(3,17)
+            sage: H = HarmonicCocycles(X,2,prec=10)
+            sage: H.hecke_operator(5).matrix().nrows() == H.dimension() # indirect doctest
+            True
+        """
+        try: return self.__restriction
+        except AttributeError: pass
+        A = self.basis_matrix().transpose()
+        pivots = list(self.basis_matrix().pivots())
+        P = A.matrix_from_rows(pivots).inverse()
+        self.__restriction = (pivots,P)
+        return self.__restriction
+
     def __compute_operator_matrix(self,T):
         r"""
         Compute the matrix of the operator `T`.
@@ -1303,7 +1561,10 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
 
         INPUT:
 
-        - ``T`` - A linear function on the space of harmonic cocycles.
+        - ``T`` - the matrix of a linear operator on the functions
+          from edges to the coefficient module, as returned by
+          :meth:`_edge_operator_matrix`, which preserves the space of
+          harmonic cocycles.
 
         OUTPUT:
 
@@ -1317,15 +1578,11 @@ class HarmonicCocycles(AmbientHeckeModule,UniqueRepresentation):
             sage: print [o.rational_reconstruction() for o in A.charpoly().coefficients()]
             [-12, -1, 4, 1]
         """
-        R = self._R
         A = self.basis_matrix().transpose()
-        basis = self.basis()
-        B = zero_matrix(R,len(self._E) * (self._k-1),self.dimension())
-        for rr in range(len(basis)):
-            g = T(basis[rr])
-            B.set_block(0,rr,Matrix(R,len(self._E) * (self._k-1),1,[g._F[e].moment(ii)  for e in range(len(self._E)) for ii in range(self._k-1) ]))
-
-        res = (A.solve_right(B)).transpose()
+        pivots,P = self.__restriction_data()
+        ## Only the entries at the pivots are needed to read off the
+        ## coordinates of the image of each basis element
+        res = (P * (T.matrix_from_rows(pivots) * A)).transpose()
         res.set_immutable()
         return res
 
@@ -1718,10 +1975,10 @@ class pAutomorphicFormElement(ModuleElement):
         if use_ps_dists:
             if MMM._U.is_symk():
                 return
+            self._improve_moments()
+            return
         U = MMM._U
         h1 = MMM(self)
-        if use_ps_dists:
-            h1._value = [o.lift(M = MMM.precision_cap()) for o in h1._value]
         h2 = MMM._apply_Up_operator(h1,True)
         verbose("Applied Up once")
         ii = 0
@@ -1740,6 +1997,68 @@ class pAutomorphicFormElement(ModuleElement):
             verbose('Applied Up %s times'%(ii+1))
         self._value = [U(c) for c in h2._value]
 
+    def _improve_moments(self):
+        r"""
+        Iterates the `U_p` operator on the stacked moments of the
+        values of ``self`` until they stabilize, as :meth:`_improve`
+        does when the coefficients are distributions.
+
+        Each iteration is one product with the matrix returned by
+        :meth:`pAutomorphicForms._Up_matrix`. The moments of order at
+        most the weight are kept fixed. The iteration starts with few
+        moments, where the `i`-th moment of `M` is only known modulo
+        `p^{M-i}`, and the number of moments is doubled every time
+        the iteration stabilizes, or after `M` iterations at that
+        level, since each iteration gains about one digit of
+        precision. Since the lower moments of the image only depend
+        on the lower moments, up to this precision, the cheap
+        iterations give a good starting point for the more expensive
+        ones.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(7,2)
+            sage: H = HarmonicCocycles(X,2,prec = 10)
+            sage: h = H.gen(0)
+            sage: A = pAutomorphicForms(X,2,prec = 10,overconvergent=True)
+            sage: A.lift(h) # indirect doctest
+            p-adic automorphic form of cohomological weight 0
+        """
+        MMM = self.parent()
+        U = MMM._U
+        n = MMM._n
+        Mfull = min([MMM.precision_cap(),U.precision_cap()])
+        values = [o.lift(M = Mfull) for o in MMM(self)._value]
+        N = len(values)
+        moments = [[o.moment(ii) for ii in range(Mfull)] for o in values]
+        M = min([2*(n+1),Mfull])
+        iters = 0
+        while True:
+            Up = MMM._Up_matrix(M)
+            x = [moments[jj][ii] for jj in range(N) for ii in range(M)]
+            level_iters = 0
+            while level_iters < M:
+                level_iters += 1
+                iters += 1
+                y = (Up*Matrix(MMM._R,N*M,1,x)).list()
+                for jj in range(N):
+                    for ii in range(M):
+                        if ii <= n:
+                            y[jj*M+ii] = x[jj*M+ii]
+                        else:
+                            y[jj*M+ii] = y[jj*M+ii].add_bigoh(M-ii)
+                stable = all([(a-b).is_zero() for a,b in izip(x,y)])
+                x = y
+                if stable:
+                    break
+            verbose('Applied Up %s times, with %s moments (%s in total)'%(level_iters,M,iters))
+            for jj in range(N):
+                moments[jj][:M] = x[jj*M:(jj+1)*M]
+            if M == Mfull:
+                break
+            M = min([2*M,Mfull])
+        self._value = [U(o) for o in moments]
+
     def integrate(self,f,center = 1,level = 0,method = 'moments'):
         r"""
         Calculate
@@ -1845,7 +2164,10 @@ class pAutomorphicFormElement(ModuleElement):
 
         - ``z`` - (default: None). If specified, returns the value of
           the form at the point ``zz`` in the `p`-adic upper half
-          plane.
+          plane. If it is a list of points, returns the list of
+          values at these points; with the method ``moments`` the
+          coverings and the moments of ``self`` on their balls are
+          then computed only once for all the points.
 
         - ``level`` - integer (default: 0). If ``method`` is
           'riemann_sum', will use a covering of `\PP^1(\QQ_p)` with
@@ -1892,7 +2214,16 @@ class pAutomorphicFormElement(ModuleElement):
             sage: a,b,c,d = X.embed_quaternion(X.get_units_of_order()[1]).change_ring(T.base_ring()).list()
             sage: ((c*x + d)^2*f(x)-f((a*x + b)/(c*x + d))).valuation()
             5
+
+        Several values can be computed at once::
+
+            sage: f0.modular_form([x,x+7]) == [f(x),f(x+7)]
+            True
         """
+        if isinstance(z,(list,tuple)):
+            if method == 'moments':
+                return _poisson_kernel_values(self.parent()._source._BT,lambda e:_dist_moments(self.evaluate(e)),self.parent()._U.weight(),list(z),level)
+            return [self.derivative(zz,level,method,order = 0) for zz in z]
         return self.derivative(z,level,method,order = 0)
 
     def derivative(self,z = None,level = 0,method = 'moments',order = 1):
@@ -2491,6 +2822,71 @@ class pAutomorphicForms(Module,UniqueRepresentation):
                 newF.append(self._U(x))
         return newF
 
+    def _Up_matrix(self,M = None):
+        r"""
+        Returns the matrix of the `U_p` operator, without scaling, on
+        the first ``M`` moments of the values of a form.
+
+        The matrix acts on the column vector obtained by concatenating
+        the first ``M`` moments of the values at each edge of
+        ``self._list``. It is a sparse matrix of `M \times M` blocks,
+        with `p` nonzero blocks in each row of blocks, and it is
+        computed once for each number of moments.
+
+        INPUT:
+
+        - ``M`` - integer (Default: None). The number of moments. If
+          None, or larger than the precision cap of the coefficients,
+          use the precision cap.
+
+        EXAMPLES::
+
+            sage: X = BTQuotient(3,11)
+            sage: A = pAutomorphicForms(X,4,10, overconvergent = True)
+            sage: Up = A._Up_matrix(5)
+            sage: Up.is_sparse(), Up.nrows() == 5*len(X.get_list())
+            (True, True)
+            sage: A._Up_matrix(5) is Up
+            True
+        """
+        try: Ups = self.__Up_matrices
+        except AttributeError:
+            Ups = self.__Up_matrices = dict()
+        Mfull = self._U.precision_cap()
+        if M is None or M > Mfull:
+            M = Mfull
+        try: return Ups[M]
+        except KeyError: pass
+        N = len(self._list)
+        if M < Mfull:
+            ## The lower moments of the image only depend on the lower
+            ## moments, up to the precision of M moments
+            Up = self._Up_matrix(Mfull)
+            indices = [jj*Mfull+ii for jj in range(N) for ii in range(M)]
+            Up = Up.matrix_from_rows_and_columns(indices,indices)
+            Up.set_immutable()
+            Ups[M] = Up
+            return Up
+        HeckeData = self._source._get_Up_data()
+        prec = self._U.base_ring().precision_cap()
+        blocks = dict()
+        for jj in range(N):
+            for d in HeckeData:
+                gg = d[0] # acter
+                u = d[1][jj] # edge_list[jj]
+                r = (self._p**(-(u.power)) * (u.t(prec + 2*u.power + 1)*gg))
+                C = self._U.acting_matrix(self._Sigma0(r.adjoint(),check = False),M).transpose()
+                try:
+                    blocks[(jj,u.label)] += C
+                except KeyError:
+                    blocks[(jj,u.label)] = C
+        Up = Matrix(self._R,N*M,N*M,0,sparse = True)
+        for (jj,ee),C in blocks.iteritems():
+            Up.set_block(jj*M,ee*M,C)
+        Up.set_immutable()
+        Ups[M] = Up
+        return Up
+
     def _apply_Up_operator(self,f,scale = False, fix_lowdeg_terms = True):
         r"""
         Apply the Up operator to ``f``.
@@ -2503,16 +2899,25 @@ class pAutomorphicForms(Module,UniqueRepresentation):
             sage: F = A.lift(M.basis()[0]); F # indirect doctest
             p-adic automorphic form of cohomological weight 2
         """
-        HeckeData = self._source._get_Up_data()
         if scale == False:
             factor = self._p**(self._U.weight()/2)
         else:
             factor = 1
 
-        # Save original moments
         if use_ps_dists:
-            orig_moments = [ [fval._moments[ii] for ii in range(self._n+1)] for fval in f._value]
+            M = min([self._U.precision_cap()]+[len(fval._moments) for fval in f._value])
+            N = len(self._list)
+            x = [fval.moment(ii) for fval in f._value for ii in range(M)]
+            y = (self._Up_matrix(M)*Matrix(self._R,N*M,1,x)).list()
+            Tf = []
+            for jj in range(N):
+                tmp = [factor*o for o in y[jj*M:(jj+1)*M]]
+                # Keep the original moments of low degree
+                tmp[:self._n+1] = x[jj*M:jj*M+self._n+1]
+                Tf.append(self._U(tmp))
+            return self(Tf)
 
+        HeckeData = self._source._get_Up_data()
 
         Tf = []
         for jj in range(len(self._list)):
@@ -2521,16 +2926,10 @@ class pAutomorphicForms(Module,UniqueRepresentation):
                 gg = d[0] # acter
                 u = d[1][jj] # edge_list[jj]
                 r = (self._p**(-(u.power)) * (u.t(self._U.base_ring().precision_cap() + 2*u.power + 1)*gg))
-                if use_ps_dists:
-                    tmp +=  self._Sigma0(r.adjoint(),check = False) * f._value[u.label]  # Warning: should activate check...
-                else:
-                    tmp += f._value[u.label].r_act_by(r)
+                tmp += f._value[u.label].r_act_by(r)
 
             tmp  *=  factor
             for ii in range(self._n+1):
-                if use_ps_dists:
-                    tmp._moments[ii] = orig_moments[jj][ii]
-                else:
-                    tmp.moments[ii,0] = f._value[jj].moments[ii,0]
+                tmp.moments[ii,0] = f._value[jj].moments[ii,0]
             Tf.append(tmp)
         return self(Tf)
@@ -0,0 +1,14 @@
+r"""
+The names defined by the families scripts, imported lazily.
+
+Nothing is preparsed or executed until one of these names is used; then
+only the group of scripts defining it (and the groups it uses) is
+loaded.  See :mod:`sage.modular.overconvergent.families.loader`.
+"""
+
+from sage.misc.lazy_import import lazy_import
+from loader import defined_names
+
+for _names in defined_names().values():
+    lazy_import('sage.modular.overconvergent.families.loader', _names)
+del _names
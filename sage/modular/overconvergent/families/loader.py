@@ -0,0 +1,256 @@
+r"""
+Loading the families scripts on demand.
+
+The families code is written as Sage scripts (``.sage`` files).  Rather
+than preparsing and executing all of them at startup, as ``master.sage``
+does, this module loads them by group, and only when a name defined in a
+group is first used.  The preparsed and compiled code of each script is
+cached on disk under ``DOT_SAGE``, keyed by its source, so a worker
+process only pays for unmarshalling the bytecode of the groups it needs.
+
+All scripts are executed in one shared namespace, so that classes are
+defined once and the scripts can refer to each other's globals as they
+do when attached.
+
+EXAMPLES::
+
+    sage: from sage.modular.overconvergent.families import loader
+    sage: loader.loaded_groups()
+    []
+    sage: 'dist' in loader.defined_names()['modules']
+    True
+    sage: loader.dist
+    <class '__main__.dist'>
+    sage: loader.loaded_groups()
+    ['utils', 'modules']
+"""
+
+import os
+import sys
+import marshal
+from hashlib import sha1
+from types import ModuleType
+
+from sage.misc.misc import DOT_SAGE, SAGE_ROOT
+
+## The groups of scripts, in loading order, with the groups they use.
+GROUPS = [('utils', ['utils.sage'], []),
+          ('modules', ['modules/dist.sage', 'modules/dist_char.sage', 'modules/dist_fam.sage',
+                       'modules/symk.sage', 'modules/ps_fam.sage'], ['utils']),
+          ('modsym', ['modsym/fund_domain.sage', 'modsym/modsym.sage', 'modsym/modsym_symk.sage',
+                      'modsym/modsym_dist.sage', 'modsym/modsym_dist_aws.sage',
+                      'modsym/modsym_dist_families.sage'], ['modules', 'utils']),
+          ('ordinary_subspace', ['ordinary_subspace/ordinary_subspace.sage',
+                                 'ordinary_subspace/compute_for_big_ordinary_subspace.sage'], ['modsym']),
+          ('pLfunction', ['pLfunction/pLfunction.sage'], ['modsym'])]
+
+_group_files = dict([(g, files) for g, files, deps in GROUPS])
+_group_deps = dict([(g, deps) for g, files, deps in GROUPS])
+
+_namespace = None
+_loaded = []
+_defined_names = None
+
+def script_dir():
+    r"""
+    Returns the directory containing the ``.sage`` scripts.
+
+    These are not installed with the library, so if they are not next to
+    this file they are read from the Sage source tree.
+
+    EXAMPLES::
+
+        sage: import os
+        sage: from sage.modular.overconvergent.families.loader import script_dir
+        sage: os.path.exists(os.path.join(script_dir(), 'utils.sage'))
+        True
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    if os.path.exists(os.path.join(here, 'utils.sage')):
+        return here
+    return os.path.join(SAGE_ROOT, 'devel', 'sage', 'sage', 'modular', 'overconvergent', 'families')
+
+def cache_dir():
+    r"""
+    Returns the directory in which the compiled scripts are cached.
+
+    EXAMPLES::
+
+        sage: from sage.misc.misc import DOT_SAGE
+        sage: from sage.modular.overconvergent.families.loader import cache_dir
+        sage: cache_dir().startswith(DOT_SAGE)
+        True
+    """
+    return os.path.join(DOT_SAGE, 'families_cache')
+
+def compiled_script(filename):
+    r"""
+    Returns the code object of the preparsed script ``filename``,
+    relative to :func:`script_dir`.
+
+    The code object is cached in :func:`cache_dir` under the hash of
+    the source and of the Python version, so that editing a script
+    invalidates its cache entry.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import compiled_script
+        sage: compiled_script('utils.sage').co_filename.endswith('utils.sage')
+        True
+    """
+    path = os.path.join(script_dir(), filename)
+    source = open(path).read()
+    key = sha1(sys.version + source).hexdigest()
+    cached = os.path.join(cache_dir(), key + '.code')
+    if os.path.exists(cached):
+        try:
+            return marshal.load(open(cached, 'rb'))
+        except (EOFError, ValueError, TypeError):
+            pass
+    from sage.misc.preparser import preparse_file
+    code = compile(preparse_file(source), path, 'exec')
+    try:
+        if not os.path.exists(cache_dir()):
+            os.makedirs(cache_dir())
+        tmp = cached + '.%s'%os.getpid()
+        f = open(tmp, 'wb')
+        marshal.dump(code, f)
+        f.close()
+        os.rename(tmp, cached)
+    except (IOError, OSError):
+        pass
+    return code
+
+def namespace():
+    r"""
+    Returns the namespace in which the scripts are executed; it starts
+    out as a copy of the global namespace of ``sage.all``.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import namespace
+        sage: namespace()['ZZ']
+        Integer Ring
+    """
+    global _namespace
+    if _namespace is None:
+        import sage.all
+        _namespace = dict(sage.all.__dict__)
+        _namespace['__name__'] = '__main__'
+    return _namespace
+
+def load_group(group):
+    r"""
+    Loads the scripts of ``group``, after the groups it uses, and
+    returns the shared namespace.  Groups are only loaded once.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import load_group
+        sage: 'prep_hecke' in load_group('utils')
+        True
+        sage: load_group('foo')
+        Traceback (most recent call last):
+        ...
+        ValueError: no group of scripts named foo
+    """
+    if group not in _group_files:
+        raise ValueError("no group of scripts named %s"%group)
+    ns = namespace()
+    if group in _loaded:
+        return ns
+    for dep in _group_deps[group]:
+        load_group(dep)
+    for filename in _group_files[group]:
+        exec compiled_script(filename) in ns
+    _loaded.append(group)
+    return ns
+
+def load_families():
+    r"""
+    Loads all the scripts and returns the shared namespace.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import load_families
+        sage: 'pLfunction' in load_families()
+        True
+    """
+    for group, files, deps in GROUPS:
+        load_group(group)
+    return namespace()
+
+def loaded_groups():
+    r"""
+    Returns the names of the groups of scripts loaded so far, in the
+    order they were loaded.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import loaded_groups
+        sage: type(loaded_groups())
+        <type 'list'>
+    """
+    return list(_loaded)
+
+def defined_names():
+    r"""
+    Returns a dictionary mapping each group to the names of the classes
+    and functions its scripts define at top level.
+
+    This only scans the sources, so it is cheap, and it is what allows
+    names to be looked up before any script has been executed.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import defined_names
+        sage: 'pLfunction' in defined_names()['pLfunction']
+        True
+    """
+    global _defined_names
+    if _defined_names is None:
+        import re
+        pattern = re.compile(r'^(?:def|class)\s+([A-Za-z_][A-Za-z_0-9]*)', re.MULTILINE)
+        _defined_names = {}
+        for group, files, deps in GROUPS:
+            names = []
+            for filename in files:
+                source = open(os.path.join(script_dir(), filename)).read()
+                names.extend([name for name in pattern.findall(source) if name not in names])
+            _defined_names[group] = names
+    return _defined_names
+
+def group_of(name):
+    r"""
+    Returns the group whose scripts define ``name``, or None.
+
+    EXAMPLES::
+
+        sage: from sage.modular.overconvergent.families.loader import group_of
+        sage: group_of('aplist_to_anlist_fam'), group_of('foo')
+        ('modsym', None)
+    """
+    for group, files, deps in GROUPS:
+        if name in defined_names()[group]:
+            return group
+    return None
+
+class _LazyScripts(ModuleType):
+    r"""
+    The type of this module: looking up a name defined by the scripts
+    loads the group defining it.
+    """
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        group = group_of(name)
+        if group is None:
+            raise AttributeError("the families scripts do not define %s"%name)
+        return load_group(group)[name]
+
+## keep the original module alive, since its dictionary is the global
+## namespace of the functions above
+_module = _LazyScripts(__name__, __doc__)
+_module._original_module = sys.modules[__name__]
+_module.__dict__.update(globals())
+sys.modules[__name__] = _module
@@ -53,6 +53,10 @@ cdef class WeightKAction(Action):
 cdef class WeightKAction_vector(WeightKAction):
     pass
 
+cdef class MomentArray(SageObject):
+    cdef long* _data
+    cdef Py_ssize_t n
+
 cdef class SimpleMat(SageObject):
     cdef long* _mat
     cdef long M
@@ -24,6 +24,7 @@ from sage.misc.prandom import random
 from sage.functions.other import floor
 from sage.structure.element cimport RingElement, Element
 import operator
+from copy import copy
 #from sage.modular.overconvergent.pollack.S0p import S0
 from sage.rings.padics.padic_generic import pAdicGeneric
 from sage.rings.padics.padic_capped_absolute_element cimport pAdicCappedAbsoluteElement
@@ -38,9 +39,16 @@ cdef extern from "zn_poly/zn_poly.h":
     pass
 from sage.libs.flint.zmod_poly cimport *, zmod_poly_t
 from sage.libs.flint.long_extras cimport *
+from cpython.string cimport PyString_FromStringAndSize, PyString_AS_STRING
+from cpython.buffer cimport PyBUF_FORMAT
+from libc.string cimport memcpy
+import struct
 
 from sigma0 import Sigma0
 
+cdef extern from *:
+    ctypedef unsigned long long uint128 "unsigned __int128"
+
 cdef long overflow = 1 << (4*sizeof(long)-1)
 cdef long underflow = -overflow
 cdef long maxordp = (1L << (sizeof(long) * 8 - 2)) - 1
@@ -81,6 +89,71 @@ def get_dist_classes(p, prec_cap, base, symk):
     else:
         return Dist_vector, WeightKAction_vector
 
+# The matrices returned by diff_eqn_matrix.  At most diff_eqn_cache_limit
+# entries in total are kept; the least recently used matrices are discarded
+# first.
+diff_eqn_cache_limit = 2**20
+_diff_eqn_matrices = {}
+_diff_eqn_order = []
+_diff_eqn_total = 0
+
+def diff_eqn_matrix(M, K):
+    r"""
+    Returns the matrix of the linear map solving the difference equation.
+
+    If `v` is the vector of the first ``M`` moments of a distribution
+    of total measure zero, then ``v * diff_eqn_matrix(M, K)`` is the
+    vector of moments of a distribution `\mu` with `\mu | \Delta = v`,
+    where `\Delta = [1, 1; 0, 1] - 1`.  Stacking several moment
+    vectors as the rows of a matrix solves all of the equations with a
+    single product.
+
+    INPUT:
+
+    - ``M`` -- a nonnegative integer, the number of moments
+
+    - ``K`` -- a field containing the moments
+
+    OUTPUT:
+
+    - an `M \times M` matrix over ``K``.  The result is cached, within
+      the bound ``diff_eqn_cache_limit`` on the total number of entries
+      of the cached matrices.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import diff_eqn_matrix
+        sage: diff_eqn_matrix(3, QQ)
+        [   0    0    0]
+        [   1 -1/2  1/6]
+        [   0  1/2 -1/2]
+        sage: diff_eqn_matrix(3, QQ) is diff_eqn_matrix(3, QQ)
+        True
+    """
+    global _diff_eqn_total
+    key = (M, K)
+    if _diff_eqn_matrices.has_key(key):
+        _diff_eqn_order.remove(key)
+        _diff_eqn_order.append(key)
+        return _diff_eqn_matrices[key]
+    B = matrix(K, M, M)
+    bern = [bernoulli(i) for i in range(0,M,2)]
+    minhalf = ~K(-2)
+    for m in range(1,M):
+        minv = ~K(m)
+        # bernoulli(1) = -1/2; the only nonzero odd bernoulli number
+        B[m,m] += minhalf
+        for j in range(m-1,M,2):
+            B[m,j] += binomial(j,m-1) * bern[(j-m+1)//2] * minv
+    B.set_immutable()
+    _diff_eqn_matrices[key] = B
+    _diff_eqn_order.append(key)
+    _diff_eqn_total += M*M
+    while _diff_eqn_total > diff_eqn_cache_limit and len(_diff_eqn_order) > 0:
+        old = _diff_eqn_order.pop(0)
+        _diff_eqn_total -= _diff_eqn_matrices.pop(old).nrows()**2
+    return B
+
 cdef class Dist(ModuleElement):
     r"""
         The main p-adic distribution class, implemented as per the paper
@@ -673,14 +746,68 @@ cdef class Dist_vector(Dist):
         r"""
         Used for pickling.
 
+        Distributions over `\ZZ_p` or `\QQ_p` are pickled compactly
+        by :func:`pack_dists`; other ones (e.g. over `\QQ`) pickle
+        their vector of moments.
+
         EXAMPLE::
 
+            sage: D = Distributions(0, 7, 10, base=Qp(7, 10))
+            sage: y = D([1, 2, 3])
+            sage: y.__reduce__()[0]
+            <built-in function unpickle_dist_v1>
+            sage: loads(dumps(y)) == y
+            True
             sage: D = sage.modular.pollack_stevens.distributions.Symk(2)
             sage: x = D([2,3,4])
             sage: x.__reduce__()
             (<type 'sage.modular.pollack_stevens.dist.Dist_vector'>, ((2, 3, 4), Sym^2 Q^2, False))
         """
-        return (self.__class__,(self._moments,self.parent(),False))
+        try:
+            return (unpickle_dist_v1, (self.parent(),) + pack_dists([self]))
+        except TypeError:
+            return (self.__class__,(self._moments,self.parent(),False))
+
+    def moment_array(self):
+        r"""
+        Returns the unscaled moments of ``self`` as a contiguous array of
+        C longs, which supports the buffer protocol.
+
+        The moments are lifted to `[0, p^N)`, where `N` is the precision
+        cap of the parent; their precision and ``self.ordp`` are not
+        recorded.  The array is a copy: it is read-only and does not
+        follow later changes to ``self``.
+
+        A ``TypeError`` is raised if the moments are not in `\ZZ_p` or
+        `\QQ_p`, and a ``ValueError`` if `p^N` does not fit in a long.
+
+        EXAMPLES::
+
+            sage: D = Distributions(0, 7, 10, base=Qp(7, 10))
+            sage: m = memoryview(D([1, 2, 3]).moment_array())
+            sage: m.tolist(), m.format, m.readonly
+            ([1, 2, 3], 'l', True)
+            sage: Symk(2)([1, 2, 3]).moment_array()
+            Traceback (most recent call last):
+            ...
+            TypeError: moments can not be packed
+        """
+        parent = self.parent()
+        p = parent.prime()
+        R = parent.base_ring()
+        if p == 0 or not isinstance(R, pAdicGeneric) or R.degree() > 1:
+            raise TypeError("moments can not be packed")
+        pN = ZZ(p)**parent.precision_cap()
+        if pN >= ZZ(2)**(8*sizeof(long)-1):
+            raise ValueError("moments do not fit in longs")
+        cdef Py_ssize_t j, M = len(self._moments)
+        cdef MomentArray ans = MomentArray(M)
+        for j in range(M):
+            try:
+                ans._data[j] = ZZ(self._moments[j].lift()) % pN
+            except (TypeError, ValueError):
+                raise TypeError("moments can not be packed")
+        return ans
 
     cdef Dist_vector _new_c(self):
         r"""
@@ -962,15 +1089,7 @@ cdef class Dist_vector(Dist):
         R = self.parent().base_ring()
         K = R.fraction_field()
         V = self._moments.parent()
-        v = [K(0) for i in range(M)]
-        bern = [bernoulli(i) for i in range(0,M,2)]
-        minhalf = ~K(-2)
-        for m in range(1,M):
-            scalar = K(self.moment(m) / m)
-            # bernoulli(1) = -1/2; the only nonzero odd bernoulli number
-            v[m] += m * minhalf * scalar 
-            for j in range(m-1,M,2):
-                v[j] += binomial(j,m-1) * bern[(j-m+1)//2] * scalar
+        v = list(vector(K, [self.moment(m) for m in range(M)]) * diff_eqn_matrix(M, K))
         p = self.parent().prime()
         cdef Dist_vector ans
         if p == 0:
@@ -998,7 +1117,6 @@ cdef class Dist_vector(Dist):
             #            print "precision loss = ",prec_loss
             if prec_loss > 0:
                 ans._moments = ans._moments[:(N-prec_loss)]
-            print ans
         return ans
 
     #def lift(self):
@@ -1403,10 +1521,349 @@ cdef class Dist_long(Dist):
         EXAMPLE::
 
             sage: D = Distributions(0, 5, 10)
-            sage: D([1,2,3,4]).__reduce__()
-            (<type 'sage.modular.pollack_stevens.dist.Dist_long'>, ([1, 2, 3, 4], Space of 5-adic distributions with k=0 action and precision cap 10, 0, False))
+            sage: x = D([1,2,3,4])
+            sage: x.__reduce__()[0]
+            <built-in function unpickle_dist_v1>
+            sage: loads(dumps(x))
+            (1, 2, 3, 4)
         """
-        return (self.__class__,([self._moments[i] for i in xrange(self.relprec)], self.parent(), self.ordp, False))
+        return (unpickle_dist_v1, (self.parent(),) + pack_dists([self]))
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        r"""
+        Exposes the moments through the buffer protocol.
+
+        The buffer is the C array of moments itself, so no copy is made
+        and writes through a writable view change the distribution.  The
+        moments are not normalized first.
+
+        EXAMPLES::
+
+            sage: D = Distributions(0, 5, 10)
+            sage: x = D([1,2,3,4])
+            sage: memoryview(x).tolist()
+            [1, 2, 3, 4]
+            sage: memoryview(x).format
+            'l'
+
+        Each view keeps its own shape::
+
+            sage: m = memoryview(x); len(m)
+            4
+        """
+        # the shape belongs to the view, since relprec may change later
+        cdef Py_ssize_t* shape = <Py_ssize_t*>sage_malloc(sizeof(Py_ssize_t))
+        if shape == NULL:
+            raise MemoryError
+        shape[0] = self.relprec
+        buffer.buf = <char*>self._moments
+        buffer.obj = self
+        buffer.len = self.relprec * sizeof(long)
+        buffer.readonly = 0
+        buffer.itemsize = sizeof(long)
+        buffer.format = NULL
+        if flags & PyBUF_FORMAT:
+            buffer.format = 'l'
+        buffer.ndim = 1
+        buffer.shape = shape
+        buffer.strides = &buffer.itemsize
+        buffer.suboffsets = NULL
+        buffer.internal = shape
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        r"""
+        Frees the shape of the view; the moments are owned by ``self``.
+
+        TESTS::
+
+            sage: D = Distributions(0, 5, 10)
+            sage: m = memoryview(D([1,2])); del m
+        """
+        sage_free(buffer.internal)
+
+cdef class MomentArray(SageObject):
+    r"""
+    A read-only contiguous array of C longs, as returned by
+    :meth:`Dist_vector.moment_array`, exposed through the buffer protocol.
+
+    INPUT:
+
+    - ``n`` -- the length of the array, whose entries start at zero
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import MomentArray
+        sage: memoryview(MomentArray(3)).tolist()
+        [0, 0, 0]
+    """
+    def __cinit__(self, Py_ssize_t n):
+        r"""
+        Memory initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist import MomentArray
+            sage: len(memoryview(MomentArray(0)))
+            0
+        """
+        cdef Py_ssize_t i
+        self.n = n
+        self._data = <long*>sage_malloc(max(1, n)*sizeof(long))
+        if self._data == NULL:
+            raise MemoryError
+        for i in range(n):
+            self._data[i] = 0
+
+    def __dealloc__(self):
+        r"""
+        Deallocation.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist import MomentArray
+            sage: A = MomentArray(2); del A
+        """
+        sage_free(self._data)
+
+    def __len__(self):
+        r"""
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist import MomentArray
+            sage: len(MomentArray(2))
+            2
+        """
+        return self.n
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        r"""
+        Exposes the array through the buffer protocol, without copying.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist import MomentArray
+            sage: memoryview(MomentArray(2)).readonly
+            True
+        """
+        buffer.buf = <char*>self._data
+        buffer.obj = self
+        buffer.len = self.n * sizeof(long)
+        buffer.readonly = 1
+        buffer.itemsize = sizeof(long)
+        buffer.format = NULL
+        if flags & PyBUF_FORMAT:
+            buffer.format = 'l'
+        buffer.ndim = 1
+        # the length of the array never changes
+        buffer.shape = &self.n
+        buffer.strides = &buffer.itemsize
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        r"""
+        Nothing needs to be released since the array is owned by ``self``.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist import MomentArray
+            sage: m = memoryview(MomentArray(2)); del m
+        """
+        pass
+
+cdef int _max_long_moments = 60 # the size of Dist_long._moments
+
+def _pack_header(H):
+    r"""
+    Packs a list of integers as little-endian 64-bit integers.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import _pack_header, _unpack_header
+        sage: len(_pack_header([1, -2]))
+        16
+        sage: _unpack_header(_pack_header([1, -2]))
+        (1, -2)
+    """
+    return struct.pack('<%sq'%len(H), *[int(h) for h in H])
+
+def _unpack_header(header):
+    r"""
+    Inverse of :func:`_pack_header`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import _unpack_header
+        sage: _unpack_header('abc')
+        Traceback (most recent call last):
+        ...
+        ValueError: corrupt header
+    """
+    if len(header) % 8 != 0:
+        raise ValueError("corrupt header")
+    return struct.unpack('<%sq'%(len(header) // 8), header)
+
+def pack_dists(values):
+    r"""
+    Packs the moments of a list of distributions into contiguous data.
+
+    All of the distributions must lie in a common space.  The result
+    consists of a string holding the relative precision and valuation of
+    each distribution as 64-bit integers, followed by the moments: for
+    :class:`Dist_long` these are the raw C arrays, normalized, concatenated
+    into a single string; for :class:`Dist_vector` over `\ZZ_p` or `\QQ_p`
+    the header also holds the absolute precision of each moment, and the
+    moments, lifted to `[0, p^N)` with `N` the precision cap, are the
+    digits of a single integer in base `p^N`.
+
+    The distributions themselves are not modified.
+
+    INPUT:
+
+    - ``values`` -- a list of distributions with a common parent
+
+    OUTPUT:
+
+    - a pair ``(header, payload)``, to be passed to :func:`unpack_dists`
+
+    A ``TypeError`` is raised if the moments cannot be packed, for
+    example over `\QQ` or an extension of `\QQ_p`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import pack_dists, unpack_dists
+        sage: D = Distributions(0, 7, 5)
+        sage: L = [D([1,2,3]), 7*D([4,5])]
+        sage: unpack_dists(D, *pack_dists(L)) == L
+        True
+        sage: D = Distributions(0, 7, 50)
+        sage: L = [D([1,2,3]), 7*D([4,5])]
+        sage: unpack_dists(D, *pack_dists(L)) == L
+        True
+
+    The precision of each moment is kept::
+
+        sage: x = D([1 + O(7^2), 2, 3])
+        sage: [a.precision_absolute() for a in unpack_dists(D, *pack_dists([x]))[0]._moments]
+        [2, 2, 1]
+        sage: pack_dists([Symk(2)([1,2,3])])
+        Traceback (most recent call last):
+        ...
+        TypeError: moments can not be packed
+    """
+    cdef Dist_long vl
+    cdef Dist_vector vv
+    header = []
+    if len(values) == 0:
+        return (_pack_header(header), '')
+    parent = values[0].parent()
+    if parent.Element is Dist_long:
+        payload = []
+        for v in values:
+            ## normalize a copy, leaving v untouched
+            vl = (<Dist_long?>v)._new_c()
+            vl.relprec = (<Dist_long>v).relprec
+            vl.ordp = (<Dist_long>v).ordp
+            memcpy(vl._moments, (<Dist_long>v)._moments, vl.relprec * sizeof(long))
+            vl.normalize()
+            header.append(vl.relprec)
+            header.append(vl.ordp)
+            payload.append(PyString_FromStringAndSize(<char*>vl._moments, vl.relprec * sizeof(long)))
+        return (_pack_header(header), ''.join(payload))
+    p = parent.prime()
+    R = parent.base_ring()
+    if p == 0 or not isinstance(R, pAdicGeneric) or R.degree() > 1:
+        raise TypeError("moments can not be packed")
+    pN = ZZ(p)**parent.precision_cap()
+    digits = []
+    for v in values:
+        vv = <Dist_vector?>v
+        M = len(vv._moments)
+        header.append(M)
+        header.append(vv.ordp)
+        for j in range(M):
+            a = vv._moments[j]
+            try:
+                digits.append(ZZ(a.lift()) % pN)
+            except (TypeError, ValueError):
+                raise TypeError("moments can not be packed")
+            header.append(min(a.precision_absolute(), M-j))
+    return (_pack_header(header), ZZ(digits, pN))
+
+def unpack_dists(parent, header, payload):
+    r"""
+    Recovers a list of distributions from the output of :func:`pack_dists`.
+
+    INPUT:
+
+    - ``parent`` -- the space of distributions the values lie in
+
+    - ``header``, ``payload`` -- as returned by :func:`pack_dists`
+
+    OUTPUT:
+
+    - a list of elements of ``parent``
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import pack_dists, unpack_dists
+        sage: D = Distributions(2, 5, 10)
+        sage: x = D([1,2,3,4])
+        sage: unpack_dists(D, *pack_dists([x, x])) == [x, x]
+        True
+    """
+    cdef Dist_long ansl
+    cdef Py_ssize_t i, n, offset = 0
+    cdef char* data
+    H = _unpack_header(header)
+    ans = []
+    if parent.Element is Dist_long:
+        if len(H) % 2 != 0:
+            raise ValueError("corrupt header")
+        n = len(H) // 2
+        if any([H[2*i] < 0 or H[2*i] > _max_long_moments for i in range(n)]) or len(payload) != sum([H[2*i] for i in range(n)]) * sizeof(long):
+            raise ValueError("corrupt header")
+        data = PyString_AS_STRING(payload)
+        for i in range(n):
+            ansl = PY_NEW(Dist_long)
+            ansl._parent = parent
+            ansl.prime_pow = parent.prime_pow
+            ansl.relprec = H[2*i]
+            ansl.ordp = H[2*i+1]
+            memcpy(ansl._moments, data + offset, ansl.relprec * sizeof(long))
+            offset += ansl.relprec * sizeof(long)
+            ans.append(ansl)
+        return ans
+    pN = ZZ(parent.prime())**parent.precision_cap()
+    sizes = []
+    i = 0
+    while i < len(H):
+        if H[i] < 0 or i + 2 + H[i] > len(H):
+            raise ValueError("corrupt header")
+        sizes.append(i)
+        i += 2 + H[i]
+    digits = ZZ(payload).digits(pN, padto=sum([H[i] for i in sizes]))
+    for i in sizes:
+        M = H[i]
+        V = parent.approx_module(M)
+        R = V.base_ring()
+        moments = V([R(digits[offset+j]).add_bigoh(H[i+2+j]) for j in range(M)])
+        ans.append(Dist_vector(moments, parent, H[i+1], False))
+        offset += M
+    return ans
+
+def unpickle_dist_v1(parent, header, payload):
+    r"""
+    Unpickles a distribution pickled by ``__reduce__``.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import unpickle_dist_v1, pack_dists
+        sage: D = Distributions(0, 5, 10)
+        sage: unpickle_dist_v1(D, *pack_dists([D([1,2,3])]))
+        (1, 2, 3)
+    """
+    return unpack_dists(parent, header, payload)[0]
 
 cdef class WeightKAction(Action):
     r"""
@@ -1513,7 +1970,7 @@ cdef class WeightKAction(Action):
                 return mats[M]
             maxprec = self._maxprecs[g]
             if M < maxprec:
-                A = mats[maxprec][:M,:M] # submatrix; might want to reduce precisions
+                A = self._truncate_acting_matrix(mats[maxprec], M)
                 mats[M] = A
                 return A
             if M < 2*maxprec:
@@ -1524,10 +1981,40 @@ cdef class WeightKAction(Action):
             mats[maxprec] = self._compute_acting_matrix(g, maxprec) # could lift from current maxprec
             if M == maxprec:
                 return mats[maxprec]
-            A = mats[maxprec][:M,:M] # submatrix; might want to reduce precisions
+            A = self._truncate_acting_matrix(mats[maxprec], M)
             mats[M] = A
             return A
 
+    cpdef _truncate_acting_matrix(self, A, M):
+        r"""
+        Returns the acting matrix at precision ``M`` obtained from an
+        acting matrix ``A`` at a higher precision.
+
+        Column `j` of the result only needs to be known modulo
+        `p^{M-j}`, since that is the precision of the `j`-th moment of
+        the image; subclasses reduce it accordingly.
+
+        INPUT:
+
+        - ``A`` -- an acting matrix, as returned by :meth:`_compute_acting_matrix`
+
+        - ``M`` -- a positive integer, at most the size of ``A``
+
+        OUTPUT:
+
+        - the top left `M \times M` block of ``A``
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.distributions import Distributions, Symk
+            sage: from sage.modular.pollack_stevens.sigma0 import Sigma0
+            sage: D = Distributions(0, 7, 10, base=Qp(7, 10))
+            sage: A = D.acting_matrix(Sigma0(7)([1,2,7,1]), 10)
+            sage: D._act._truncate_acting_matrix(A, 3) == D._act._compute_acting_matrix(Sigma0(7)([1,2,7,1]).matrix(), 3)
+            True
+        """
+        return A[:M,:M]
+
 #    cpdef _check_mat(self, a, b, c, d):
 #        r"""
 #        
@@ -1577,6 +2064,133 @@ cdef class WeightKAction(Action):
         """
         raise NotImplementedError
 
+def scale_powers(a, b, c, d, M, base_ring):
+    r"""
+    Returns the powers `s^j` for `0 \le j < M` of the power series
+    `s = (b+dy)/(a+cy)` over ``base_ring``, to precision `M`.
+
+    Column `j` of the matrix by which `[a, b; c, d]` acts in weight `k`
+    is `(a+cy)^k s^j`, so these powers do not depend on `k`.
+
+    INPUT:
+
+    - ``a``, ``b``, ``c``, ``d`` -- the entries of the acting matrix,
+      after adjustment
+
+    - ``M`` -- a positive integer, the precision
+
+    - ``base_ring`` -- the ring over which to compute
+
+    OUTPUT:
+
+    - a list of ``M`` power series in `y`
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import scale_powers
+        sage: scale_powers(1, 2, 0, 1, 3, QQ)
+        [1, 2 + y + O(y^3), 4 + 4*y + y^2 + O(y^3)]
+    """
+    R = PowerSeriesRing(base_ring, 'y', default_prec = M)
+    y = R.gen()
+    scale = (b+d*y)/(a+c*y)
+    powers = [R(1)]
+    for j in range(1, M):
+        powers.append(powers[-1] * scale)
+    return powers
+
+# The matrices returned by scale_power_matrix, shared by the actions of all
+# weights.  At most scale_power_cache_limit entries in total are kept; the
+# least recently used matrices are discarded first.
+scale_power_cache_limit = 2**20
+_scale_power_matrices = {}
+_scale_power_order = []
+_scale_power_total = 0
+
+def scale_power_matrix(a, b, c, d, M, base_ring):
+    r"""
+    Returns the `M \times M` matrix whose column `j` holds the first
+    `M` coefficients of `s^j`, where `s = (b+dy)/(a+cy)`.
+
+    The matrix by which `[a, b; c, d]` acts in weight `k` is the
+    product of the lower triangular Toeplitz matrix of `(a+cy)^k` with
+    this one, so it is shared by the actions of all weights.  It is
+    lifted to `\ZZ` when ``base_ring`` is `\ZZ/p^M\ZZ`, so that this
+    product is a single integer matrix multiplication.
+
+    The result is cached on the integers ``a``, ``b``, ``c``, ``d``,
+    on ``M`` and on ``base_ring``.  The cache is bounded (see
+    ``scale_power_cache_limit``) and emptied by
+    :func:`clear_scale_power_matrices`.
+
+    INPUT:
+
+    - ``a``, ``b``, ``c``, ``d`` -- integers, the entries of the acting
+      matrix after adjustment
+
+    - ``M`` -- a positive integer, the precision
+
+    - ``base_ring`` -- `\QQ` or `\ZZ/p^M\ZZ`
+
+    OUTPUT:
+
+    - an immutable `M \times M` matrix over `\QQ` or `\ZZ`
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import scale_power_matrix
+        sage: scale_power_matrix(1, 2, 0, 1, 3, QQ)
+        [1 2 4]
+        [0 1 4]
+        [0 0 1]
+        sage: scale_power_matrix(1, 2, 0, 1, 3, QQ) is scale_power_matrix(1, 2, 0, 1, 3, QQ)
+        True
+        sage: scale_power_matrix(1, 2, 7, 1, 3, Zmod(7^3)).base_ring()
+        Integer Ring
+    """
+    global _scale_power_total
+    cdef Matrix B
+    cdef long row, col
+    key = (ZZ(a), ZZ(b), ZZ(c), ZZ(d), M, base_ring)
+    try:
+        B = _scale_power_matrices[key]
+        _scale_power_order.remove(key)
+        _scale_power_order.append(key)
+        return B
+    except KeyError:
+        pass
+    powers = scale_powers(a, b, c, d, M, base_ring)
+    lifted = QQ if base_ring is QQ else ZZ
+    B = matrix(lifted, M, M)
+    for col in range(M):
+        for row in range(M):
+            B.set_unsafe(row, col, lifted(powers[col][row]))
+    B.set_immutable()
+    _scale_power_matrices[key] = B
+    _scale_power_order.append(key)
+    _scale_power_total += M*M
+    while _scale_power_total > scale_power_cache_limit and len(_scale_power_order) > 0:
+        old = _scale_power_order.pop(0)
+        _scale_power_total -= _scale_power_matrices.pop(old).nrows()**2
+    return B
+
+def clear_scale_power_matrices():
+    r"""
+    Empties the cache of :func:`scale_power_matrix`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist import scale_power_matrix, clear_scale_power_matrices
+        sage: B = scale_power_matrix(1, 2, 0, 1, 3, QQ)
+        sage: clear_scale_power_matrices()
+        sage: scale_power_matrix(1, 2, 0, 1, 3, QQ) is B
+        False
+    """
+    global _scale_power_total
+    _scale_power_matrices.clear()
+    del _scale_power_order[:]
+    _scale_power_total = 0
+
 cdef class WeightKAction_vector(WeightKAction):
     cpdef _compute_acting_matrix(self, g, M):
         r"""
@@ -1593,11 +2207,21 @@ cdef class WeightKAction_vector(WeightKAction):
 
         OUTPUT:
 
-        - 
+        - The `M \times M` matrix whose column `j` holds the
+          coefficients of `(a+cy)^k s^j`, where `s = (b+dy)/(a+cy)`.
+          For integer matrices it is computed as a product with the
+          weight independent :func:`scale_power_matrix`.
 
         EXAMPLES::
 
             sage: from sage.modular.pollack_stevens.distributions import Distributions, Symk
+            sage: from sage.modular.pollack_stevens.sigma0 import Sigma0
+            sage: D = Distributions(4, 7, 5, base=Qp(7, 5))
+            sage: A = D._act._compute_acting_matrix(Sigma0(7)([1,2,7,1]).matrix(), 5)
+            sage: R.<y> = PowerSeriesRing(Zmod(7^5), default_prec=5)
+            sage: s = (2+y)/(1+7*y); t = (1+7*y)^4
+            sage: all(ZZ(A[i,j]) % 7^(5-j) == ZZ((t*s^j)[i]) % 7^(5-j) for i in range(5) for j in range(5))
+            True
         """
         #tim = verbose("Starting")
         a, b, c, d = self._adjuster(g)
@@ -1618,14 +2242,25 @@ cdef class WeightKAction_vector(WeightKAction):
         y = R.gen()
         #tim = verbose("Checked, made R",tim)
         # special case for small precision, large weight
-        scale = (b+d*y)/(a+c*y)
         t = (a+c*y)**k # will already have precision M
         cdef long row, col
+        cdef Matrix T
         #tim = verbose("Made matrix",tim)
-        for col in range(M):
-            for row in range(M):
-                B.set_unsafe(row, col, t[row])
-            t *= scale
+        if g.parent().base_ring() is ZZ:
+            # (a+cy)^k s^j is the Toeplitz matrix of t times column j of
+            # the weight independent matrix of powers of s
+            S = scale_power_matrix(a, b, c, d, M, base_ring)
+            T = matrix(S.base_ring(), M, M)
+            for col in range(M):
+                for row in range(col, M):
+                    T.set_unsafe(row, col, S.base_ring()(t[row-col]))
+            B = (T * S).change_ring(base_ring)
+        else:
+            scale = (b+d*y)/(a+c*y)
+            for col in range(M):
+                for row in range(M):
+                    B.set_unsafe(row, col, t[row])
+                t *= scale
         #verbose("Finished loop",tim)
         # the changering here is annoying, but otherwise we have to change ring each time we multiply
         B = B.change_ring(self.codomain().base_ring())
@@ -1633,7 +2268,55 @@ cdef class WeightKAction_vector(WeightKAction):
             B *= self._character(a)
         if self._dettwist is not None:
             B *= (a*d - b*c)**(self._dettwist)
-        return B
+        return self._reduce_columns(B, M)
+
+    cpdef _truncate_acting_matrix(self, A, M):
+        r"""
+        Returns the top left `M \times M` block of the acting matrix
+        ``A``, with column `j` reduced to precision `p^{M-j}`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.distributions import Distributions, Symk
+            sage: from sage.modular.pollack_stevens.sigma0 import Sigma0
+            sage: D = Distributions(0, 7, 10, base=Qp(7, 10))
+            sage: A = D._act._truncate_acting_matrix(D.acting_matrix(Sigma0(7)([1,2,7,1]), 10), 3)
+            sage: [A[0,j].precision_absolute() for j in range(3)]
+            [10, 2, 1]
+        """
+        return self._reduce_columns(A[:M,:M], M)
+
+    def _reduce_columns(self, B, M):
+        r"""
+        Reduces column `j` of ``B`` to absolute precision `M - j`.
+
+        Since the `j`-th moment of a distribution with `M` moments is
+        only defined modulo `p^{M-j}`, nothing is lost, while the
+        products with the higher columns become cheaper.  Matrices
+        over exact rings (e.g. for Sym^k) are returned unchanged.
+
+        INPUT:
+
+        - ``B`` -- an `M \times M` matrix
+
+        - ``M`` -- a nonnegative integer
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.distributions import Distributions, Symk
+            sage: D = Distributions(0, 5, 3, base=Qp(5, 3))
+            sage: B = D._act._reduce_columns(matrix(Qp(5, 3), 3, 3, [1]*9), 3)
+            sage: [B[1,j].precision_absolute() for j in range(3)]
+            [3, 2, 1]
+        """
+        if self._symk or not isinstance(B.base_ring(), pAdicGeneric):
+            return B
+        cdef Py_ssize_t row, col
+        cdef Matrix A = copy(B)
+        for col in range(1, M):
+            for row in range(M):
+                A.set_unsafe(row, col, A.get_unsafe(row, col).add_bigoh(M - col))
+        return A
 
     cpdef _call_(self, _v, g):
         r"""
@@ -1689,6 +2372,197 @@ cdef inline long mymod(long a, unsigned long pM):
         a += pM
     return a
 
+cdef inline Py_ssize_t acc_block(unsigned long pM, Py_ssize_t M):
+    """
+    Returns the number of products of integers in `[0, pM)` that can be
+    added to a 128-bit accumulator holding a value less than ``pM``
+    without overflowing, capped at ``M``.
+    """
+    cdef uint128 n
+    if pM <= 1:
+        return M
+    n = (<uint128>(-1) - pM) // (<uint128>(pM - 1) * (pM - 1))
+    if n >= <uint128>M:
+        return M
+    return <Py_ssize_t>n
+
+cdef inline long dot_mod(long* column, long* v, Py_ssize_t M, Py_ssize_t block, unsigned long q):
+    """
+    Returns the dot product of ``column`` and ``v`` reduced modulo ``q``.
+
+    The entries must be nonnegative, and ``block`` must be the output of
+    :func:`acc_block` for a bound on them.
+    """
+    cdef Py_ssize_t row = 0, stop
+    cdef uint128 acc = 0
+    while row < M:
+        stop = row + block
+        if stop > M:
+            stop = M
+        while row < stop:
+            acc += <uint128>(<unsigned long>column[row]) * (<unsigned long>v[row])
+            row += 1
+        acc %= q
+    return <long>acc
+
+cdef inline void matvec_mod(long* ans, long* mat, long* v, Py_ssize_t M, unsigned long pM):
+    """
+    Sets ``ans`` to the product of the vector ``v`` with the `M \times M`
+    matrix ``mat``, stored column by column as in :class:`SimpleMat`,
+    reduced modulo ``pM``.
+
+    The entries of ``mat`` and ``v`` must lie in `[0, pM)`.  Products are
+    accumulated in 128 bits and the remainder is only taken when the
+    accumulator could next overflow, which for `pM < 2^{60}` and `M`
+    at most 60 means once per column.  Thus there is no restriction on
+    ``pM`` beyond fitting in a word.
+
+    INPUT:
+
+    - ``ans`` -- an array of length ``M``, which is overwritten
+
+    - ``mat`` -- an array of length ``M*M``
+
+    - ``v`` -- an array of length ``M``
+
+    - ``M`` -- the dimension
+
+    - ``pM`` -- the modulus
+    """
+    cdef Py_ssize_t col
+    cdef Py_ssize_t block = acc_block(pM, M)
+    for col in range(M):
+        ans[col] = dot_mod(mat + M*col, v, M, block, pM)
+
+cdef inline void matvec_fil(long* ans, long* mat, long* v, Py_ssize_t M, long* pows):
+    """
+    Sets ``ans`` to the product of the vector ``v`` with the `M \times M`
+    matrix ``mat`` (stored as in :class:`SimpleMat`), with the `j`-th
+    entry reduced modulo `p^{M-j}`.
+
+    This is the action on distributions respecting the filtration: the
+    `j`-th moment is only defined modulo `p^{M-j}`.  The columns are
+    split in two blocks by precision.  The first columns, whose moduli
+    are large, are computed with 128-bit accumulators as in
+    :func:`matvec_mod`.  For the remaining columns the modulus is small
+    enough that, after reducing ``v`` once modulo the largest of them,
+    all ``M`` products add up in a single word, with one remainder per
+    column.
+
+    INPUT:
+
+    - ``ans`` -- an array of length ``M``, which is overwritten
+
+    - ``mat`` -- an array of length ``M*M`` whose column `j` has entries
+      in `[0, p^{M-j})`
+
+    - ``v`` -- an array of length ``M`` with entries in `[0, p^M)`
+
+    - ``M`` -- the dimension, at most 60
+
+    - ``pows`` -- an array with ``pows[i]`` equal to `p^i` for `0 \le i \le M`
+    """
+    cdef Py_ssize_t row, col, split = 0
+    cdef long* column
+    cdef unsigned long q, acc
+    cdef unsigned long[60] w
+    if M == 0:
+        return
+    cdef Py_ssize_t block = acc_block(pows[M], M)
+    while split < M:
+        q = pows[M-split] - 1
+        if <uint128>q * q <= (<unsigned long>(-1)) / (<unsigned long>M):
+            break
+        ans[split] = dot_mod(mat + M*split, v, M, block, pows[M-split])
+        split += 1
+    if split == M:
+        return
+    q = pows[M-split]
+    for row in range(M):
+        w[row] = (<unsigned long>v[row]) % q
+    for col in range(split, M):
+        column = mat + M*col
+        acc = 0
+        for row in range(M):
+            acc += (<unsigned long>column[row]) * w[row]
+        ans[col] = acc % (<unsigned long>pows[M-col])
+
+cdef SimpleMat reduce_fil(SimpleMat B, p):
+    """
+    Reduces column `j` of ``B`` modulo `p^{M-j}`, in place, where `M` is
+    the size of ``B``, and returns ``B``.
+
+    The entries of ``B`` must be nonnegative.
+    """
+    cdef Py_ssize_t row, col, M = B.M
+    cdef unsigned long q = 1
+    for col in range(M-1, -1, -1):
+        q *= p
+        for row in range(M):
+            B._mat[M*col + row] = (<unsigned long>B._mat[M*col + row]) % q
+    return B
+
+def _test_matvec_mod(p, M, trials=5):
+    r"""
+    Checks the action kernels against integer arithmetic on random input.
+
+    Both the kernel reducing every entry modulo `p^M` and the one
+    reducing the `j`-th entry modulo `p^{M-j}` are tested.
+
+    INPUT:
+
+    - ``p`` -- a prime
+
+    - ``M`` -- a positive integer, at most 60, with `p^M < 2^{63}`
+
+    - ``trials`` -- the number of random matrices and vectors to try
+
+    OUTPUT:
+
+    - True if the results agree, otherwise an AssertionError is raised.
+
+    EXAMPLES:
+
+    We sweep the modulus up to `2^{62}`, well past the products fitting
+    in a word::
+
+        sage: from sage.modular.pollack_stevens.dist import _test_matvec_mod
+        sage: all(_test_matvec_mod(p, M) for p in [2, 3, 5, 7, 101, 65537] for M in range(1, 61) if p**M <= 2**62) # 64-bit
+        True
+    """
+    if M > 60:
+        raise ValueError("at most 60 moments are supported")
+    p = ZZ(p)
+    pM = p**M
+    m = M
+    cdef SimpleMat B = SimpleMat(m)
+    cdef long[60] v
+    cdef long[60] ans
+    cdef long[61] pows
+    cdef Py_ssize_t i
+    for i in range(m+1):
+        pows[i] = p**i
+    for _ in range(trials):
+        A = MatrixSpace(ZZ, m, m).random_element(x=0, y=pM)
+        w = [ZZ.random_element(0, pM) for i in range(m)]
+        for i in range(m*m):
+            B._mat[i] = A[i % m, i // m]
+        for i in range(m):
+            v[i] = w[i]
+        matvec_mod(ans, B._mat, v, m, pM)
+        expected = vector(ZZ, w) * A
+        for i in range(m):
+            assert ans[i] == expected[i] % pM, "kernel disagrees at p = %s, M = %s"%(p, M)
+        reduce_fil(B, p)
+        for i in range(m):
+            w[i] = w[i] % pows[m-i]
+            v[i] = w[i]
+        matvec_fil(ans, B._mat, v, m, pows)
+        expected = vector(ZZ, w) * A
+        for i in range(m):
+            assert ans[i] == expected[i] % pows[m-i], "filtered kernel disagrees at p = %s, M = %s"%(p, M)
+    return True
+
 cdef class SimpleMat(SageObject):
     r"""
     A simple class emulating a square matrix that holds its values as
@@ -1822,7 +2696,24 @@ cdef class WeightKAction_long(WeightKAction):
                 zmod_poly_mul_trunc_n(t, t, scale, M)
         if self._character is not None:
             B = B * self._character(_a,_b,_c,_d)
-        return B
+        return reduce_fil(B, self._p)
+
+    cpdef _truncate_acting_matrix(self, A, M):
+        r"""
+        Returns the top left `M \times M` block of the acting matrix
+        ``A``, with column `j` reduced modulo `p^{M-j}`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.distributions import Distributions, Symk
+            sage: from sage.modular.pollack_stevens.sigma0 import Sigma0
+            sage: D = Distributions(0, 7, 10)
+            sage: g = Sigma0(7)([1,2,7,1])
+            sage: x = D([1,2,3,4,5,6,7,8,9,10])
+            sage: (x * g).reduce_precision(3) == x.reduce_precision(3) * g
+            True
+        """
+        return reduce_fil(A[:M,:M], self._p)
 
     cpdef _call_(self, _v, g):
         r"""
@@ -1852,12 +2743,13 @@ cdef class WeightKAction_long(WeightKAction):
         cdef Dist_long ans = v._new_c()
         ans.relprec = v.relprec
         ans.ordp = v.ordp
-        cdef long pM = self._p**ans.relprec
         cdef SimpleMat B = <SimpleMat>self.acting_matrix(g, ans.relprec)
-        cdef long row, col, entry = 0
-        for col in range(ans.relprec):
-            ans._moments[col] = 0
-            for row in range(ans.relprec):
-                ans._moments[col] += mymod(B._mat[entry] * v._moments[row], pM)
-                entry += 1
+        ## reduce the moments of v into a local array, leaving v untouched
+        cdef long[60] vm
+        cdef int i
+        for i in range(v.relprec):
+            vm[i] = v._moments[i] % v.prime_pow.small_powers[v.relprec-i]
+            if vm[i] < 0:
+                vm[i] += v.prime_pow.small_powers[v.relprec-i]
+        matvec_fil(ans._moments, B._mat, vm, ans.relprec, v.prime_pow.small_powers)
         return ans
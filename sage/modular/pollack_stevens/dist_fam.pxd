@@ -0,0 +1,23 @@
+from sage.structure.sage_object cimport SageObject
+
+cdef class FamActingData(SageObject):
+    cdef long* _aut
+    cdef long* _mat
+    cdef int M
+    cdef int deg
+    cdef unsigned long pM
+
+cdef class Dist_fam_long(SageObject):
+    cdef long* _moments
+    cdef long* _mods
+    cdef readonly long p
+    cdef int relprec
+    cdef readonly int deg
+    cdef int _disc
+    cdef long ordp
+    cdef object _char
+    cdef int _alloc(self, int relprec, int deg) except -1
+    cdef Dist_fam_long _new_c(self, int relprec, int deg)
+    cdef Dist_fam_long _addsub(self, Dist_fam_long right, bint negate)
+    cdef int _normalize(self) except -1
+    cdef _act(self, FamActingData data, bint weight_zero)
@@ -0,0 +1,771 @@
+#*****************************************************************************
+#       Copyright (C) 2013 Nathan Clement <clement.nathan@gmail.com>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#  as published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+r"""
+Families of distributions stored as arrays of longs.
+
+A family of distributions, i.e. an element of `D \hat{\otimes} A(W_r)`,
+has moments which are power series in the weight variable `w`.  Here the
+moments are truncated modulo `w^{deg}` and the coefficients are stored
+in a single C array, so that the arithmetic and the action of matrices
+run at the speed of :class:`~sage.modular.pollack_stevens.dist.Dist_long`.
+
+EXAMPLES::
+
+    sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+    sage: R.<w> = PowerSeriesRing(ZZ)
+    sage: mu = Dist_fam_long(5, 3, 0, [1 + 2*w, 3*w^2, 4]); mu
+    (1 + 2*w + O(w^3), 3*w^2 + O(w^3), 4 + O(w^3))
+    sage: mu + mu
+    (2 + 4*w + O(w^3), 6*w^2 + O(w^3), 3 + O(w^3))
+    sage: mu.p, mu.deg
+    (5, 3)
+
+The families of modular symbols in ``sage/modular/overconvergent/families``
+convert their values to this type (see ``dist_fam.to_long``) to compute
+Hecke operators.
+"""
+
+include "sage/ext/stdsage.pxi"
+
+from sage.rings.integer_ring import ZZ
+from sage.rings.rational_field import QQ
+from sage.rings.finite_rings.integer_mod_ring import Zmod
+from sage.rings.power_series_ring import PowerSeriesRing
+from sage.rings.infinity import Infinity
+from dist import scale_powers, Dist_long
+from distributions import Distributions
+from families_util import automorphy_factor_vector
+
+cdef extern from *:
+    ctypedef unsigned long long uint128 "unsigned __int128"
+
+cdef long overflow = 1 << (4*sizeof(long)-1)
+
+cdef class Dist_fam_long(SageObject):
+    r"""
+    A family of distributions whose moments are power series in `w`,
+    stored as a C array of longs.
+
+    The coefficient of `w^j` in the `i`-th moment is stored modulo
+    `p^{M_i}`, where `M_i = \lceil (M-i)(p-2)/(p-1) \rceil` and `M` is
+    the number of moments, and the whole family is scaled by `p^{ordp}`.
+
+    INPUT:
+
+    - ``p`` -- a prime
+
+    - ``deg`` -- the moments are known modulo `w^{deg}`
+
+    - ``r`` -- an integer from 0 to `p-2`, the disc in weight space
+
+    - ``moments`` -- a list of power series in `w` (or of lists of
+      coefficients) with `p`-integral coefficients
+
+    - ``char`` -- (default: None) a Dirichlet character
+
+    - ``ordp`` -- (default: 0) an integer
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+        sage: Dist_fam_long(7, 2, 0, [[1, 2], [3, 4]])
+        (1 + 2*w + O(w^2), 3 + 4*w + O(w^2))
+        sage: Dist_fam_long(7, 2, 0, [[1, 2]] * 20)
+        Traceback (most recent call last):
+        ...
+        ValueError: moments too long
+    """
+    def __cinit__(self):
+        r"""
+        Memory initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(7, 2, 0, [])
+            ()
+        """
+        self._moments = NULL
+        self._mods = NULL
+
+    def __init__(self, p, deg, r, moments, char=None, ordp=0):
+        r"""
+        Initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: TestSuite(Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])).run()
+        """
+        p = ZZ(p)
+        M = len(moments)
+        if M > 60 or 7*p**M > ZZ(2)**(4*sizeof(long) - 1):
+            raise ValueError("moments too long")
+        self.p = p
+        self._disc = r
+        self._char = char
+        self.ordp = ordp
+        self._alloc(M, deg)
+        Zm = Zmod(p**M)
+        cdef Py_ssize_t i, j
+        for i in range(M):
+            f = moments[i]
+            coeffs = f.list() if hasattr(f, 'list') else list(f)
+            for j in range(min(deg, len(coeffs))):
+                self._moments[i*deg + j] = Zm(coeffs[j]).lift()
+        self._normalize()
+
+    cdef int _alloc(self, int relprec, int deg) except -1:
+        r"""
+        Allocates the arrays for ``relprec`` moments modulo `w^{deg}`,
+        with all coefficients zero, and computes the moduli.
+        """
+        cdef Py_ssize_t i, k
+        cdef long e
+        self.relprec = relprec
+        self.deg = deg
+        self._moments = <long*>sage_malloc(max(1, relprec*deg)*sizeof(long))
+        self._mods = <long*>sage_malloc(max(1, relprec)*sizeof(long))
+        if self._moments == NULL or self._mods == NULL:
+            raise MemoryError
+        for i in range(relprec*deg):
+            self._moments[i] = 0
+        for i in range(relprec):
+            e = ((relprec - i) * (self.p - 2) + self.p - 2) // (self.p - 1)
+            self._mods[i] = 1
+            for k in range(e):
+                self._mods[i] *= self.p
+        return 0
+
+    def __dealloc__(self):
+        r"""
+        Deallocation.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2]]); del mu
+        """
+        sage_free(self._moments)
+        sage_free(self._mods)
+
+    cdef Dist_fam_long _new_c(self, int relprec, int deg):
+        r"""
+        Creates a zero family with the same prime, disc and character.
+        """
+        cdef Dist_fam_long ans = PY_NEW(Dist_fam_long)
+        ans.p = self.p
+        ans._disc = self._disc
+        ans._char = self._char
+        ans.ordp = self.ordp
+        ans._alloc(relprec, deg)
+        return ans
+
+    def __reduce__(self):
+        r"""
+        Used in pickling.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: loads(dumps(mu)) == mu
+            True
+        """
+        cdef Py_ssize_t i, j
+        moments = [[self._moments[i*self.deg + j] for j in range(self.deg)] for i in range(self.relprec)]
+        return (Dist_fam_long, (self.p, self.deg, self._disc, moments, self._char, self.ordp))
+
+    def __repr__(self):
+        r"""
+        Returns the list of moments, as a string.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]]).scale(5)
+            (5 + 10*w + O(w^2), 15 + 20*w + O(w^2))
+        """
+        return "(" + ", ".join([repr(self.moment(i)) for i in range(self.relprec)]) + ")"
+
+    def __richcmp__(left, right, int op):
+        r"""
+        Equality of families, moment by moment.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: mu == mu.scale(6)
+            False
+            sage: mu == mu.scale(26)
+            True
+            sage: mu != mu.scale(26)
+            False
+        """
+        if op != 2 and op != 3:
+            return NotImplemented
+        if not isinstance(left, Dist_fam_long) or not isinstance(right, Dist_fam_long):
+            return op == 3
+        equal = left.num_moments() == right.num_moments() and all([left.moment(i) == right.moment(i) for i in range(left.num_moments())])
+        return equal if op == 2 else not equal
+
+    def moment(self, n):
+        r"""
+        Returns the ``n``-th moment, a power series in `w`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 3, 0, [[1, 2, 3]]).moment(0)
+            1 + 2*w + 3*w^2 + O(w^3)
+        """
+        if n < 0 or n >= self.relprec:
+            raise IndexError("moment out of range")
+        cdef Py_ssize_t j
+        f = PowerSeriesRing(ZZ, 'w')([self._moments[n*self.deg + j] for j in range(self.deg)], self.deg)
+        if self.ordp == 0:
+            return f
+        return ZZ(self.p)**self.ordp * f
+
+    def num_moments(self):
+        r"""
+        Returns the number of moments.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 3, 0, [[1, 2, 3], [4]]).num_moments()
+            2
+        """
+        return self.relprec
+
+    def char(self):
+        r"""
+        Returns the character of ``self``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 3, 0, [[1]]).char() is None
+            True
+        """
+        return self._char
+
+    def disc(self):
+        r"""
+        Returns the disc of weight space on which ``self`` lives.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 3, 2, [[1]]).disc()
+            2
+        """
+        return self._disc
+
+    cdef int _normalize(self) except -1:
+        r"""
+        Reduces the coefficients of each moment modulo its modulus.
+        """
+        cdef Py_ssize_t i, j
+        cdef long m
+        for i in range(self.relprec):
+            m = self._mods[i]
+            for j in range(i*self.deg, (i+1)*self.deg):
+                self._moments[j] = self._moments[j] % m
+                if self._moments[j] < 0:
+                    self._moments[j] += m
+        return 0
+
+    def normalize(self):
+        r"""
+        Reduces the coefficients of the `i`-th moment modulo `p^{M_i}`.
+
+        This happens after every operation, so it is only needed after
+        modifying ``self`` in place.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 1, 0, [[126], [126], [126]]).normalize()
+            (1 + O(w), 1 + O(w), 1 + O(w))
+        """
+        self._normalize()
+        return self
+
+    def valuation(self):
+        r"""
+        Returns the minimum `p`-adic valuation of the coefficients of the moments.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 2, 0, [[5, 25], [0, 50]]).valuation()
+            1
+            sage: Dist_fam_long(5, 2, 0, [[0, 0]]).valuation()
+            +Infinity
+        """
+        cdef Py_ssize_t i
+        cdef long v = -1, u, x
+        for i in range(self.relprec*self.deg):
+            x = self._moments[i]
+            if x != 0:
+                u = 0
+                while x % self.p == 0:
+                    x = x // self.p
+                    u += 1
+                if v < 0 or u < v:
+                    v = u
+        if v < 0:
+            return Infinity
+        return v + self.ordp
+
+    cdef Dist_fam_long _addsub(self, Dist_fam_long right, bint negate):
+        r"""
+        Common code for the sum and the difference of two families.
+        """
+        cdef long aprec = min(self.ordp + self.relprec, right.ordp + right.relprec)
+        cdef long ordp = min(self.ordp, right.ordp)
+        cdef int deg = min(self.deg, right.deg)
+        cdef Dist_fam_long ans = self._new_c(max(0, aprec - ordp), deg)
+        ans.ordp = ordp
+        cdef Py_ssize_t i, j
+        cdef long pM = 1, sp = 1, rp = 1, x, y
+        for i in range(ans.relprec):
+            pM *= self.p
+        for i in range(self.ordp - ordp):
+            sp = (sp * self.p) % pM
+            if sp == 0:
+                break
+        for i in range(right.ordp - ordp):
+            rp = (rp * self.p) % pM
+            if rp == 0:
+                break
+        for i in range(ans.relprec):
+            for j in range(deg):
+                x = self._moments[i*self.deg + j] if i < self.relprec else 0
+                y = right._moments[i*right.deg + j] if i < right.relprec else 0
+                x = (<uint128>sp * x) % pM
+                y = (<uint128>rp * y) % pM
+                ans._moments[i*deg + j] = x - y if negate else x + y
+        ans._normalize()
+        return ans
+
+    def __add__(left, right):
+        r"""
+        Sum of two families.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: mu + mu.scale(5)
+            (6 + 12*w + O(w^2), 3 + 4*w + O(w^2))
+
+        The shift between the valuations may be large::
+
+            sage: mu + mu.scale(5^40) == mu
+            True
+            sage: R.<w> = PowerSeriesRing(ZZ)
+            sage: (mu.scale(5^40) + mu.scale(5^41)).moment(0) == 5^40*(6 + 12*w)
+            True
+        """
+        return (<Dist_fam_long?>left)._addsub(<Dist_fam_long?>right, False)
+
+    def __sub__(left, right):
+        r"""
+        Difference of two families.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: mu - mu
+            (O(w^2), O(w^2))
+        """
+        return (<Dist_fam_long?>left)._addsub(<Dist_fam_long?>right, True)
+
+    def scale(self, left):
+        r"""
+        Returns ``left`` times ``self``.
+
+        INPUT:
+
+        - ``left`` -- a rational number, or a power series in `w` with
+          `p`-integral coefficients
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: R.<w> = PowerSeriesRing(QQ)
+            sage: mu = Dist_fam_long(5, 3, 0, [[1, 2, 0], [3, 4, 0]])
+            sage: mu.scale(1/2)
+            (13 + w + O(w^3), 4 + 2*w + O(w^3))
+            sage: mu.scale(1 + w)
+            (1 + 3*w + 2*w^2 + O(w^3), 3 + 2*w + 4*w^2 + O(w^3))
+            sage: mu.scale(1/5).moment(0)
+            1/5 + 2/5*w + O(w^3)
+        """
+        cdef Dist_fam_long ans = self._new_c(self.relprec, self.deg)
+        cdef Py_ssize_t i, j, k
+        cdef long pM = 1, s
+        cdef uint128 acc
+        for i in range(self.relprec):
+            pM *= self.p
+        Zm = Zmod(pM)
+        if left in QQ:
+            left = QQ(left)
+            if left == 0:
+                return ans
+            v = left.valuation(self.p)
+            s = Zm(left / self.p**v).lift()
+            ans.ordp = self.ordp + v
+            for i in range(self.relprec*self.deg):
+                ans._moments[i] = (<uint128>self._moments[i] * s) % pM
+        else:
+            coeffs = [Zm(a).lift() for a in left.list()[:self.deg]]
+            for i in range(self.relprec):
+                for j in range(self.deg):
+                    acc = 0
+                    for k in range(min(j+1, len(coeffs))):
+                        acc += <uint128>self._moments[i*self.deg + j - k] * <long>coeffs[k]
+                    ans._moments[i*self.deg + j] = acc % pM
+        ans._normalize()
+        return ans
+
+    def change_deg(self, new_deg):
+        r"""
+        Reduces the moments modulo `w^{new\_deg}`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 3, 0, [[1, 2, 3]]).change_deg(1)
+            (1 + O(w))
+        """
+        if new_deg > self.deg:
+            raise ValueError("can only lower degree")
+        cdef Dist_fam_long ans = self._new_c(self.relprec, new_deg)
+        cdef Py_ssize_t i, j
+        for i in range(self.relprec):
+            for j in range(new_deg):
+                ans._moments[i*new_deg + j] = self._moments[i*self.deg + j]
+        return ans
+
+    def change_precision(self, M):
+        r"""
+        Only keeps the first ``M`` moments.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: Dist_fam_long(5, 1, 0, [[126], [126], [126]]).change_precision(1)
+            (1 + O(w))
+        """
+        if M > self.relprec:
+            raise ValueError("not enough moments")
+        cdef Dist_fam_long ans = self._new_c(M, self.deg)
+        cdef Py_ssize_t i
+        for i in range(M*self.deg):
+            ans._moments[i] = self._moments[i]
+        ans._normalize()
+        return ans
+
+    cdef _act(self, FamActingData data, bint weight_zero):
+        r"""
+        Applies the action described by ``data``: the automorphy factor
+        (unless ``weight_zero``), followed by the weight zero matrix.
+        """
+        cdef Py_ssize_t M = self.relprec, D = self.deg
+        cdef Py_ssize_t r, c, j, j1, col, row
+        cdef unsigned long pM = data.pM
+        cdef uint128 acc
+        cdef long* v = self._moments
+        cdef long* t
+        cdef Dist_fam_long ans = self._new_c(M, D)
+        if not weight_zero:
+            ## the automorphy factor acts by a Toeplitz matrix in z whose
+            ## entries are series in w
+            t = <long*>sage_malloc(max(1, M*D)*sizeof(long))
+            if t == NULL:
+                raise MemoryError
+            for c in range(M):
+                for j in range(D):
+                    acc = 0
+                    for r in range(M - c):
+                        for j1 in range(j+1):
+                            acc += <uint128>data._aut[r*data.deg + j1] * v[(c+r)*D + j - j1]
+                    t[c*D + j] = acc % pM
+            v = t
+        for col in range(M):
+            for j in range(D):
+                acc = 0
+                for row in range(M):
+                    acc += <uint128>data._mat[M*col + row] * v[row*D + j]
+                ans._moments[col*D + j] = acc % pM
+        if not weight_zero:
+            sage_free(t)
+        ans._normalize()
+        return ans
+
+    def act_right(self, gam):
+        r"""
+        Returns ``self`` acted on by the matrix ``gam`` on the right.
+
+        INPUT:
+
+        - ``gam`` -- a `2 \times 2` integer matrix, with lower left entry
+          divisible by `p` and upper left entry prime to `p`
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4], [0, 1]])
+            sage: mu.act_right(matrix(ZZ, 2, 2, [1, 0, 0, 1])) == mu
+            True
+            sage: g = matrix(ZZ, 2, 2, [1, 2, 5, 11])
+            sage: mu.act_right(g).act_right(g.inverse().change_ring(ZZ)) == mu
+            True
+        """
+        data = fam_acting_data(self.p, self.relprec, self.deg, self._disc, self._char, gam[0,0], gam[0,1], gam[1,0], gam[1,1])
+        return self._act(data, False)
+
+    def act_right_weight_zero(self, gam):
+        r"""
+        Returns ``self`` acted on by the matrix ``gam`` in weight zero,
+        i.e. without the automorphy factor.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4], [0, 1]])
+            sage: mu.act_right_weight_zero(matrix(ZZ, 2, 2, [1, 1, 0, 1]))
+            (1 + 2*w + O(w^2), 4 + 6*w + O(w^2), 2 + w + O(w^2))
+        """
+        data = fam_acting_data(self.p, self.relprec, self.deg, self._disc, self._char, gam[0,0], gam[0,1], gam[1,0], gam[1,1])
+        return self._act(data, True)
+
+    def specialize(self, k):
+        r"""
+        Returns the specialization of ``self`` to weight ``k``, i.e. the
+        distribution whose moments are those of ``self`` evaluated at
+        `w = ((1+p)^k-1)/p`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: mu.specialize(4)
+            (19, 4)
+        """
+        return self.specialize_weights([k])[0]
+
+    def specialize_weights(self, ks):
+        r"""
+        Returns the specializations of ``self`` to all the weights in ``ks``.
+
+        The moments are evaluated at all the points `((1+p)^k-1)/p` at
+        once, as the product of the array of moments with the Vandermonde
+        matrix of the points, modulo `p^M`.
+
+        Since the `i`-th moment of the family is only known modulo
+        `p^{M_i}`, the specializations only have `\lceil M(p-2)/(p-1) \rceil`
+        moments, whose precisions `p^{M_0-i}` are at most the `p^{M_i}`.
+
+        INPUT:
+
+        - ``ks`` -- a list of integers, all congruent to the disc of
+          ``self`` modulo `p-1`
+
+        OUTPUT:
+
+        - a list of distributions, in ``Distributions(k, p, M_0)`` for each
+          ``k`` in ``ks``
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import Dist_fam_long
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2], [3, 4]])
+            sage: mu.specialize_weights([0, 4, 8])
+            [(1, 3), (19, 4), (22, 0)]
+            sage: mu = Dist_fam_long(5, 2, 0, [[1, 2]] * 4)
+            sage: mu.specialize(4).precision_relative()
+            3
+            sage: mu.specialize_weights([1])
+            Traceback (most recent call last):
+            ...
+            ValueError: Wrong component of weight space
+        """
+        cdef Py_ssize_t M = self.relprec, D = self.deg, n = len(ks)
+        cdef Py_ssize_t i, j, t
+        ## the number of moments known to the precision of Distributions
+        cdef Py_ssize_t R = (M * (self.p - 2) + self.p - 2) // (self.p - 1)
+        cdef long pM = 1
+        cdef uint128 acc
+        for i in range(M):
+            pM *= self.p
+        for k in ks:
+            if k % (self.p - 1) != self._disc:
+                raise ValueError("Wrong component of weight space")
+        cdef long* V = <long*>sage_malloc(max(1, n*D)*sizeof(long))
+        cdef long* out = <long*>sage_malloc(max(1, n*M)*sizeof(long))
+        if V == NULL or out == NULL:
+            sage_free(V)
+            sage_free(out)
+            raise MemoryError
+        Zm = Zmod(pM)
+        try:
+            for t in range(n):
+                x = Zm((QQ(1 + self.p)**ks[t] - 1) / self.p)
+                y = Zm(1)
+                for j in range(D):
+                    V[t*D + j] = y.lift()
+                    y *= x
+            for t in range(n):
+                for i in range(M):
+                    acc = 0
+                    for j in range(D):
+                        acc += <uint128>self._moments[i*D + j] * V[t*D + j]
+                    out[t*M + i] = (acc % pM) % self._mods[i]
+            ans = []
+            for t in range(n):
+                Dk = Distributions(ks[t], self.p, R)
+                moments = [out[t*M + i] % ZZ(self.p)**(R - i) for i in range(R)]
+                if Dk.Element is Dist_long:
+                    ans.append(Dk.Element(moments, Dk, self.ordp, check=False))
+                else:
+                    ans.append(Dk.Element(Dk.approx_module(R)(moments), Dk, self.ordp, check=False))
+        finally:
+            sage_free(V)
+            sage_free(out)
+        return ans
+
+cdef class FamActingData(SageObject):
+    r"""
+    The data describing the action of a matrix on families: the
+    automorphy factor, as an `M \times deg` array of coefficients of
+    `z^r w^j`, and the weight zero acting matrix, stored column by column
+    as in :class:`~sage.modular.pollack_stevens.dist.SimpleMat`, all
+    modulo `p^M`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist_fam import fam_acting_data
+        sage: fam_acting_data(5, 2, 2, 0, None, 1, 0, 0, 1)
+        Action data on 2 moments modulo w^2
+    """
+    def __cinit__(self, int M, int deg):
+        r"""
+        Memory initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import FamActingData
+            sage: FamActingData(3, 2)
+            Action data on 3 moments modulo w^2
+        """
+        self.M = M
+        self.deg = deg
+        self._aut = <long*>sage_malloc(max(1, M*deg)*sizeof(long))
+        self._mat = <long*>sage_malloc(max(1, M*M)*sizeof(long))
+        if self._aut == NULL or self._mat == NULL:
+            raise MemoryError
+
+    def __dealloc__(self):
+        r"""
+        Deallocation.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import FamActingData
+            sage: A = FamActingData(3, 2); del A
+        """
+        sage_free(self._aut)
+        sage_free(self._mat)
+
+    def __repr__(self):
+        r"""
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.dist_fam import FamActingData
+            sage: FamActingData(3, 2)
+            Action data on 3 moments modulo w^2
+        """
+        return "Action data on %s moments modulo w^%s"%(self.M, self.deg)
+
+# The data returned by fam_acting_data.  The arrays of the cached data hold
+# at most fam_acting_data_cache_limit longs in total; the least recently used
+# data are discarded first.
+fam_acting_data_cache_limit = 2**22
+_fam_acting_data = {}
+_fam_acting_data_order = []
+_fam_acting_data_total = 0
+
+def fam_acting_data(p, M, deg, r, char, a, b, c, d):
+    r"""
+    Returns the data needed to act by `[a, b; c, d]` on families with
+    ``M`` moments modulo `w^{deg}` on the disc ``r``.
+
+    The result is cached, within the bound ``fam_acting_data_cache_limit``
+    on the total size of the cached arrays; the cache is emptied by
+    :func:`clear_fam_acting_data`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist_fam import fam_acting_data
+        sage: fam_acting_data(5, 3, 2, 0, None, 1, 2, 5, 11) is fam_acting_data(5, 3, 2, 0, None, 1, 2, 5, 11)
+        True
+    """
+    global _fam_acting_data_total
+    key = (p, M, deg, r, char, a, b, c, d)
+    try:
+        data = _fam_acting_data[key]
+        _fam_acting_data_order.remove(key)
+        _fam_acting_data_order.append(key)
+        return data
+    except KeyError:
+        pass
+    pM = ZZ(p)**M
+    Zm = Zmod(pM)
+    cdef FamActingData data = FamActingData(M, deg)
+    data.pM = pM
+    cdef Py_ssize_t i, j
+    R = PowerSeriesRing(QQ, 'w', default_prec=deg)
+    aut = automorphy_factor_vector(p, a, c, r, char, M, deg, R)
+    for i in range(M):
+        coeffs = R(aut[i]).list() if i < len(aut) else []
+        for j in range(deg):
+            data._aut[i*deg + j] = Zm(coeffs[j]).lift() if j < len(coeffs) else 0
+    powers = scale_powers(a, b, c, d, M, Zm)
+    for i in range(M):
+        for j in range(M):
+            data._mat[M*i + j] = powers[i][j].lift()
+    _fam_acting_data[key] = data
+    _fam_acting_data_order.append(key)
+    _fam_acting_data_total += M*deg + M*M
+    while _fam_acting_data_total > fam_acting_data_cache_limit and len(_fam_acting_data_order) > 0:
+        old = _fam_acting_data.pop(_fam_acting_data_order.pop(0))
+        _fam_acting_data_total -= old.M*old.deg + old.M*old.M
+    return data
+
+def clear_fam_acting_data():
+    r"""
+    Empties the cache of :func:`fam_acting_data`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.dist_fam import clear_fam_acting_data
+        sage: clear_fam_acting_data()
+    """
+    global _fam_acting_data_total
+    _fam_acting_data.clear()
+    del _fam_acting_data_order[:]
+    _fam_acting_data_total = 0
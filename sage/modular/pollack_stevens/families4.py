@@ -1,5 +1,6 @@
 from dist import WeightKAction_vector
-from families_util import automorphy_factor_matrix
+from fund_domain import M2Z
+from families_util import automorphy_factor_series, apply_automorphy_factor
 
 class WeightKAction_fam(WeightKAction_vector):
     """
@@ -7,7 +8,7 @@ class WeightKAction_fam(WeightKAction_vector):
     def __init__(self, Dk, character, adjuster, on_left):
         #Only difference is that it adds a cache for automorphy factors.
         self._autfactors = {}
-        WeightKAction_vector.__init___(self, Dk, character, adjuster, on_left)
+        WeightKAction_vector.__init__(self, Dk, character, adjuster, on_left)
     
     def clear_cache(self):
         #Only difference is that it clears the cache for automorphy factors.
@@ -15,17 +16,17 @@ class WeightKAction_fam(WeightKAction_vector):
         self._maxprecs = {}
         self._autfactors = {}
     
-    def _compute_aut_factor_matrix(self, g, M):
-        #compute the power series
+    def _compute_aut_factor(self, g, M):
+        #compute the power series; the Toeplitz matrix it defines is never formed
         D = self.underlying_set()
         p_prec, var_prec = D.precision_cap()
-        return automorphy_factor_matrix(D.prime(), g[0, 0], g[1,0], self._k, self._character, M, var_prec, D.base_ring())
+        return automorphy_factor_series(D.prime(), g[0, 0], g[1,0], self._k, self._character, M, var_prec, D.base_ring())
     
     def get_action_matrices(self, g, M):
         g = M2Z(g)
         g.set_immutable()
         if not self._maxprecs.has_key(g):
-            AF = self._compute_aut_factor_matrix(g, M)
+            AF = self._compute_aut_factor(g, M)
             self._autfactors[g] = {M : AF}
         else:
             auts = self._autfactors[g]
@@ -34,23 +35,25 @@ class WeightKAction_fam(WeightKAction_vector):
             else:
                 maxprec = self._maxprecs[g]
                 if M < maxprec:
-                    AF = auts[maxprec][:M,:M]
+                    AF = auts[maxprec].truncate(M)
                     auts[M] = AF
                 else:
                     if M < 2 * maxprec:
                         maxprec = 2 * maxprec
                     else:
                         maxprec = M
-                    auts[maxprec] = self._compute_aut_factor_matrix(g, maxprec)
+                    auts[maxprec] = self._compute_aut_factor(g, maxprec)
                     if M == maxprec:
                         AF = auts[maxprec]
                     else:
-                        AF = auts[maxprec][:M,:M]
+                        AF = auts[maxprec].truncate(M)
                         auts[M] = AF
         
         A = self.acting_matrix(g, M)
         return [AF, A]
     
     def _call_(self, v, g):
-        AF, A = get_action_matrices(self, g, len(v.moments))
-        return v.parent()((v.moments * AF) * A)
+        #the automorphy factor acts by a Toeplitz matrix, i.e. by a truncated product of series
+        M = len(v._moments)
+        AF, A = self.get_action_matrices(g, M)
+        return v.parent()(v._moments.parent()(apply_automorphy_factor(v._moments, AF)) * A)
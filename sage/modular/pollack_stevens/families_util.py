@@ -32,31 +32,91 @@ def logpp_gam(p, p_prec):
     loggam = ZZ(logp_fcn(p, p_prec * (p ** 2), 1 + p))
     return ps_normalize(L / loggam, p, p_prec)
 
-#@cached_function
+## Tables of the polynomials logpp_binom(n, p, p_prec), shared by all of the
+## families code.  The table for (p, p_prec) holds the polynomials for
+## n < var_prec, together with the unnormalized product needed to extend it.
+## The total number of stored coefficients, kept up to date as tables are
+## extended and discarded, stays below logpp_binom_cache_limit: the least
+## recently used tables are discarded first, including a new table which is
+## too large by itself.
+logpp_binom_cache_limit = 10 ** 6
+_logpp_binom_tables = {}
+_logpp_binom_order = []
+_logpp_binom_sizes = {}
+_logpp_binom_total = 0
+
+def logpp_binom_table(p, p_prec, var_prec):
+    """returns the list of logpp_binom(n, p, p_prec) for 0 <= n < var_prec, computed in one pass by the product recurrence"""
+    global _logpp_binom_total
+    key = (p, p_prec)
+    try:
+        L, binoms, P = _logpp_binom_tables[key]
+        _logpp_binom_order.remove(key)
+    except KeyError:
+        L = logpp_gam(p, p_prec)
+        P = L.parent()(1)
+        binoms = [P]
+        _logpp_binom_sizes[key] = 2
+        _logpp_binom_total += 2
+    _logpp_binom_order.append(key)
+    if len(binoms) < var_prec:
+        ## the size counts the coefficients of the binoms and of P
+        size = _logpp_binom_sizes[key] - len(P.list())
+        ## P is the product (L - 0)(L - 1)...(L - (n-1)), truncated, for n = len(binoms) - 1
+        for n in range(len(binoms), var_prec):
+            P = (P * (L - (n - 1))).truncate(p_prec)
+            binoms.append(ps_normalize(P * ((p ** n) / factorial(n)), p, p_prec))
+            size += len(binoms[-1].list())
+        size += len(P.list())
+        _logpp_binom_total += size - _logpp_binom_sizes[key]
+        _logpp_binom_sizes[key] = size
+    _logpp_binom_tables[key] = (L, binoms, P)
+    while _logpp_binom_total > logpp_binom_cache_limit and len(_logpp_binom_order) > 0:
+        old = _logpp_binom_order.pop(0)
+        del _logpp_binom_tables[old]
+        _logpp_binom_total -= _logpp_binom_sizes.pop(old)
+    return binoms[:var_prec]
+
+def clear_logpp_binom_tables():
+    """empties the shared logpp_binom tables"""
+    global _logpp_binom_total
+    _logpp_binom_tables.clear()
+    _logpp_binom_sizes.clear()
+    del _logpp_binom_order[:]
+    _logpp_binom_total = 0
+
 def logpp_binom(n, p, p_prec):
     """returns the (integral) power series p^n*(log_p(1+p*z)/log_p(1+p) choose n)"""
-    #prod=1+0*z
-    L = logpp_gam(p, p_prec)
-    ans = prod([(L - j) for j in range(n)])
-    #for j in range(0,n):
-    #    prod=prod*(L-j)
-    ans *= (p ** n) / factorial(n)
-    
-    return ps_normalize(ans.truncate(p_prec), p, p_prec)
+    return logpp_binom_table(p, p_prec, n + 1)[n]
+
+def automorphy_factor_series(p, a, c, k, chi, p_prec, var_prec, R):
+    """returns the automorphy factor as a polynomial in z over R, truncated at p_prec terms"""
+    return automorphy_factor_vector(p, a, c, k, chi, p_prec, var_prec, R, as_series=True).truncate(p_prec)
+
+def apply_automorphy_factor(moments, aut):
+    """returns the moments times the Toeplitz matrix of aut (see automorphy_factor_matrix), computed as a truncated product of polynomials"""
+    M = len(moments)
+    S = aut.parent()
+    rev = S([moments[M - 1 - i] for i in range(M)])
+    ans = aut.truncate(M)._mul_karatsuba(rev).list()
+    ans += [S.base_ring()(0)] * (M - len(ans))
+    return [ans[M - 1 - j] for j in range(M)]
 
-def automorphy_factor_vector(p, a, c, k, chi, p_prec, var_prec, R):
+def automorphy_factor_vector(p, a, c, k, chi, p_prec, var_prec, R, as_series=False):
     S = PolynomialRing(R, 'z')
     z = S.gens()[0]
     w = R.gen()
     aut = S(1)
+    LBs = logpp_binom_table(p, p_prec, var_prec)
+    ta = ZZ(Qp(p, 2 * max(p_prec, var_prec)).teichmuller(a))
+    arg = (a / ta - 1) / p + c / (p * ta) * z
     for n in range(1, var_prec):
-        LB = logpp_binom(n, p, p_prec)
-        ta = ZZ(Qp(p, 2 * max(p_prec, var_prec)).teichmuller(a))
-        arg = (a / ta - 1) / p + c / (p * ta) * z
-        aut += LB(arg) * (w ** n)
+        aut += LBs[n](arg) * (w ** n)
     aut *= (ta ** k)
     if not (chi is None):
         aut *= chi(a)    
+    if as_series:
+        return aut
     return Sequence(aut)
 
 #@cached_function
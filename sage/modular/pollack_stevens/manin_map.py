@@ -43,6 +43,7 @@ from sage.rings.arith import convergents
 from sage.misc.misc import verbose
 from sage.matrix.matrix_integer_2x2 import MatrixSpace_ZZ_2x2, Matrix_integer_2x2
 from sigma0 import Sigma0
+from dist import pack_dists, unpack_dists
 from fund_domain import t00, t10, t01, t11, Id, basic_hecke_matrix, M2Z
 from sage.matrix.matrix_space import MatrixSpace
 from sage.rings.integer_ring import ZZ
@@ -156,6 +157,33 @@ def unimod_matrices_from_infty(r, s):
     else:
         return []
 
+def unpickle_manin_map_v1(codomain, manin_relations, indices, header, payload):
+    r"""
+    Unpickles a :class:`ManinMap` pickled with packed moments.
+
+    INPUT:
+
+    - ``codomain`` -- the space of distributions the values lie in
+    - ``manin_relations`` -- a ManinRelations object
+    - ``indices`` -- the indices in ``manin_relations.reps()`` of the
+      matrices on which the map is known
+    - ``header``, ``payload`` -- the packed values, as returned by
+      :func:`~sage.modular.pollack_stevens.dist.pack_dists`
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.manin_map import M2Z, ManinMap, unpickle_manin_map_v1
+        sage: D = Distributions(0, 11, 10)
+        sage: manin = sage.modular.pollack_stevens.fund_domain.ManinRelations(11)
+        sage: f = ManinMap(D, manin, [D([1,2]), D([3,5]), D([1,1])])
+        sage: g = unpickle_manin_map_v1(*f.__reduce__()[1])
+        sage: g(M2Z([1,0,0,1]))
+        (1 + O(11^2), 2 + O(11))
+    """
+    values = unpack_dists(codomain, header, payload)
+    reps = manin_relations.reps()
+    return ManinMap(codomain, manin_relations, dict([(reps[i], v) for i, v in zip(indices, values)]), check=False)
+
 class ManinMap(object):
     r"""
     Map from a set of right coset representatives of `\Gamma_0(N)` in
@@ -488,6 +516,42 @@ class ManinMap(object):
         """
         return "Map from the set of right cosets of Gamma0(%s) in SL_2(Z) to %s"%(
             self._manin.level(), self._codomain)
+
+    def __reduce__(self):
+        r"""
+        Used for pickling.
+
+        When the values are distributions whose moments can be packed
+        (see :func:`~sage.modular.pollack_stevens.dist.pack_dists`), the
+        moments of all of the values are stored in one contiguous block
+        and the codomain, which determines `p`, `k` and the precision, is
+        stored only once.  Otherwise the dictionary of values is pickled.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.manin_map import M2Z, ManinMap
+            sage: D = Distributions(0, 11, 10)
+            sage: manin = sage.modular.pollack_stevens.fund_domain.ManinRelations(11)
+            sage: data  = {M2Z([1,0,0,1]):D([1,2]), M2Z([0,-1,1,3]):D([3,5]), M2Z([-1,-1,3,2]):D([1,1])}
+            sage: f = ManinMap(D, manin, data)
+            sage: f.__reduce__()[0]
+            <function unpickle_manin_map_v1 at ...>
+            sage: g = loads(dumps(f))
+            sage: [g(A) == f(A) for A in manin.gens()]
+            [True, True, True]
+            sage: S = Symk(0,QQ)
+            sage: f = ManinMap(S, manin, [S(1), S(2), S(3)])
+            sage: f.__reduce__()[0]
+            <class 'sage.modular.pollack_stevens.manin_map.ManinMap'>
+        """
+        reps = self._manin.reps()
+        index = dict([(A, i) for i, A in enumerate(reps)])
+        keys = self._dict.keys()
+        try:
+            header, payload = pack_dists([self._dict[A] for A in keys])
+        except (TypeError, AttributeError):
+            return (self.__class__, (self._codomain, self._manin, self._dict, False))
+        return (unpickle_manin_map_v1, (self._codomain, self._manin, [index[A] for A in keys], header, payload))
     
     def _eval_sl2(self, A):
         r"""
@@ -0,0 +1,15 @@
+from sage.structure.sage_object cimport SageObject
+
+cdef class Matrix_pwn(SageObject):
+    cdef long* _data
+    cdef long** _rows
+    cdef int _nrows
+    cdef int _ncols
+    cdef int n
+    cdef long p
+    cdef int m
+    cdef long pm
+    cdef int _alloc(self, int nrows, int ncols) except -1
+    cdef Matrix_pwn _new_c(self, int nrows, int ncols)
+    cdef long* _entry(self, int i, int j)
+    cdef int _row_op(self, int i, int j, long* x) except -1
@@ -0,0 +1,851 @@
+#*****************************************************************************
+#       Copyright (C) 2013 Nathan Clement <clement.nathan@gmail.com>
+#
+#  Distributed under the terms of the GNU General Public License (GPL)
+#  as published by the Free Software Foundation; either version 2 of
+#  the License, or (at your option) any later version.
+#                  http://www.gnu.org/licenses/
+#*****************************************************************************
+
+r"""
+Matrices over `(\ZZ/p^m)[w]/(w^n)`.
+
+Bases of spaces of families of overconvergent modular symbols are found
+by row reducing matrices whose entries are truncated power series in the
+weight variable `w`.  Here such a matrix is stored as one C array of
+longs, with the rows accessed through pointers so that swapping rows is
+free, and the row operations, pivoting by `(p,w)`-valuation and
+inversion of units are compiled loops.
+
+The entries are reduced modulo `p^m` in longs, so the compiled matrices
+only exist when `p^m` is small enough (see :func:`fits`); for larger
+moduli :func:`pwn_inverse` and :func:`pwn_solve` compute in
+`(\ZZ/p^m)[w]/(w^n)` with generic Sage arithmetic instead.
+
+EXAMPLES::
+
+    sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+    sage: R.<w> = ZZ[]
+    sage: A = Matrix_pwn(3, 2, 2, [[1, w], [2, 2*w]])
+    sage: A.rank()
+    1
+"""
+
+include "sage/ext/stdsage.pxi"
+
+from libc.string cimport memcpy
+from sage.rings.integer_ring import ZZ
+from sage.rings.finite_rings.integer_mod_ring import Zmod
+from sage.rings.polynomial.polynomial_ring_constructor import PolynomialRing
+from sage.rings.infinity import Infinity
+
+cdef extern from *:
+    ctypedef unsigned long long uint128 "unsigned __int128"
+
+cdef long _inverse_mod(long a, long p, long pm) except -1:
+    r"""
+    Returns the inverse of ``a`` modulo ``pm``, a power of ``p``, by
+    Hensel lifting the inverse modulo ``p``.
+    """
+    cdef long y = 1, base, e = p - 2, pk = p, t
+    a = a % pm
+    if a < 0:
+        a += pm
+    if a % p == 0:
+        raise ZeroDivisionError("%s is not a unit modulo %s"%(a, pm))
+    base = a % p
+    while e > 0:
+        if e & 1:
+            y = (y * base) % p
+        base = (base * base) % p
+        e >>= 1
+    while pk < pm:
+        ## y <- y(2 - ay) doubles the p-adic precision of y
+        pk = pm if pk > pm // pk else min(pk * pk, pm)
+        t = (<uint128>a * y) % pm
+        y = (<uint128>y * ((2 + pm - t) % pm)) % pm
+    return y
+
+cdef int _series_inverse(long* x, long* out, int n, long p, long pm) except -1:
+    r"""
+    Stores the inverse of ``x`` modulo `(pm, w^n)` in ``out``.
+
+    Returns 1 (and leaves ``out`` untouched) if ``x`` is not a unit.
+    """
+    cdef int l, l1
+    cdef uint128 acc
+    if x[0] % p == 0:
+        return 1
+    out[0] = _inverse_mod(x[0], p, pm)
+    for l in range(1, n):
+        acc = 0
+        for l1 in range(1, l+1):
+            acc += <uint128>x[l1] * out[l-l1]
+        out[l] = (<uint128>((pm - <long>(acc % pm)) % pm) * out[0]) % pm
+    return 0
+
+cdef int _series_mul(long* x, long* y, long* out, int n, long pm) except -1:
+    r"""
+    Stores `x y` modulo `(pm, w^n)` in ``out``, which must not be ``x`` or ``y``.
+    """
+    cdef int l, l1
+    cdef uint128 acc
+    for l in range(n):
+        acc = 0
+        for l1 in range(l+1):
+            acc += <uint128>x[l1] * y[l-l1]
+        out[l] = acc % pm
+    return 0
+
+cdef long _pw_valuation(long* x, int n, long p, long* pv, long* wv):
+    r"""
+    Returns the sum of the minimal `p`-adic valuation of the coefficients
+    of ``x`` and of its `w`-adic valuation, storing these in ``pv`` and
+    ``wv``, or returns -1 if ``x`` is zero.
+    """
+    cdef int l
+    cdef long v, c
+    pv[0] = -1
+    wv[0] = -1
+    for l in range(n):
+        c = x[l]
+        if c != 0:
+            if wv[0] < 0:
+                wv[0] = l
+            v = 0
+            while c % p == 0:
+                c = c // p
+                v += 1
+            if pv[0] < 0 or v < pv[0]:
+                pv[0] = v
+    if wv[0] < 0:
+        return -1
+    return pv[0] + wv[0]
+
+cdef int _series_div(long* a, long* b, long* out, int n, long p, long pm) except -1:
+    r"""
+    Stores a solution of `a x = b` modulo `(pm, w^n)` in ``out``.
+
+    The element ``a`` is written as `p^v w^{vv} u`; this is possible as
+    long as ``b`` is divisible by `p^v w^{vv}` and `u` is a unit.
+    Returns 1 if this fails.
+    """
+    cdef long v, vv, bv, bvv, pv = 1, bval, aval
+    cdef int l, ans = 0
+    cdef long* u
+    cdef long* uinv
+    cdef long* bq
+    bval = _pw_valuation(b, n, p, &bv, &bvv)
+    if bval < 0:
+        for l in range(n):
+            out[l] = 0
+        return 0
+    aval = _pw_valuation(a, n, p, &v, &vv)
+    if aval < 0 or aval > bval:
+        return 1
+    for l in range(v):
+        pv *= p
+    for l in range(n):
+        if (l < vv and b[l] != 0) or b[l] % pv != 0:
+            return 1
+    u = <long*>sage_malloc(3*n*sizeof(long))
+    if u == NULL:
+        raise MemoryError
+    uinv = u + n
+    bq = u + 2*n
+    for l in range(n):
+        u[l] = a[l+vv] // pv if l + vv < n else 0
+        bq[l] = b[l+vv] // pv if l + vv < n else 0
+    if _series_inverse(u, uinv, n, p, pm):
+        ans = 1
+    else:
+        _series_mul(bq, uinv, out, n, pm)
+    sage_free(u)
+    return ans
+
+def fits(p, m, n):
+    r"""
+    Returns whether matrices over `(\ZZ/p^m)[w]/(w^n)` can be stored
+    in a :class:`Matrix_pwn`.
+
+    The residues must fit in a long with room for one addition, and a
+    sum of `n` products of residues must fit in 128 bits.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import fits
+        sage: fits(5, 20, 10), fits(5, 30, 10)
+        (True, False)
+    """
+    pm = ZZ(p)**m
+    return pm < ZZ(2)**(8*sizeof(long) - 2) and n*pm**2 < ZZ(2)**128
+
+def _coefficients(x):
+    r"""
+    Returns the list of coefficients of ``x``, a polynomial or power
+    series in `w`, or a constant.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import _coefficients
+        sage: R.<w> = QQ[]
+        sage: _coefficients(1 + w^2), _coefficients(3)
+        ([1, 0, 1], [3])
+    """
+    if hasattr(x, 'list'):
+        return x.list()
+    return [x]
+
+cdef class Matrix_pwn(SageObject):
+    r"""
+    A matrix with entries in `(\ZZ/p^m)[w]/(w^n)`.
+
+    INPUT:
+
+    - ``p`` -- a prime
+
+    - ``m`` -- the entries are known modulo `p^m`
+
+    - ``n`` -- the entries are known modulo `w^n`
+
+    - ``entries`` -- a list of rows, each a list of polynomials or power
+      series in `w` with `p`-integral coefficients
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+        sage: R.<w> = ZZ[]
+        sage: Matrix_pwn(3, 3, 2, [[1 + w, 28], [-1, w^2]])
+        [w + 1, 1]
+        [26, 0]
+        sage: Matrix_pwn(3, 40, 2, [[1]])
+        Traceback (most recent call last):
+        ...
+        ValueError: modulus too large
+    """
+    def __cinit__(self):
+        r"""
+        Memory initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, []).nrows()
+            0
+        """
+        self._data = NULL
+        self._rows = NULL
+
+    def __init__(self, p, m, n, entries):
+        r"""
+        Initialization.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: TestSuite(Matrix_pwn(3, 3, 2, [[1, 2]])).run()
+        """
+        p = ZZ(p)
+        if not fits(p, m, n):
+            raise ValueError("modulus too large")
+        self.p = p
+        self.m = m
+        self.n = n
+        self.pm = p**m
+        nrows = len(entries)
+        ncols = len(entries[0]) if nrows > 0 else 0
+        self._alloc(nrows, ncols)
+        Zm = Zmod(self.pm)
+        cdef int i, j, l
+        cdef long* x
+        for i in range(nrows):
+            if len(entries[i]) != ncols:
+                raise ValueError("rows have different lengths")
+            for j in range(ncols):
+                x = self._entry(i, j)
+                coeffs = _coefficients(entries[i][j])
+                for l in range(min(n, len(coeffs))):
+                    x[l] = Zm(coeffs[l]).lift()
+
+    cdef int _alloc(self, int nrows, int ncols) except -1:
+        r"""
+        Allocates a zero matrix of the given size.
+        """
+        cdef int i, rowlen = ncols * self.n
+        self._nrows = nrows
+        self._ncols = ncols
+        self._data = <long*>sage_malloc(max(1, nrows*rowlen)*sizeof(long))
+        self._rows = <long**>sage_malloc(max(1, nrows)*sizeof(long*))
+        if self._data == NULL or self._rows == NULL:
+            raise MemoryError
+        for i in range(nrows*rowlen):
+            self._data[i] = 0
+        for i in range(nrows):
+            self._rows[i] = self._data + i*rowlen
+        return 0
+
+    def __dealloc__(self):
+        r"""
+        Deallocation.
+
+        TESTS::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2]]); del A
+        """
+        sage_free(self._data)
+        sage_free(self._rows)
+
+    cdef Matrix_pwn _new_c(self, int nrows, int ncols):
+        r"""
+        Creates a zero matrix over the same ring.
+        """
+        cdef Matrix_pwn ans = PY_NEW(Matrix_pwn)
+        ans.p = self.p
+        ans.m = self.m
+        ans.n = self.n
+        ans.pm = self.pm
+        ans._alloc(nrows, ncols)
+        return ans
+
+    cdef long* _entry(self, int i, int j):
+        return self._rows[i] + j*self.n
+
+    def __copy__(self):
+        r"""
+        Returns a copy of ``self``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            sage: B = copy(A); B.swap_rows(0, 1)
+            sage: A == B, A == copy(A)
+            (False, True)
+        """
+        cdef Matrix_pwn ans = self._new_c(self._nrows, self._ncols)
+        cdef int i
+        for i in range(self._nrows):
+            memcpy(ans._rows[i], self._rows[i], self._ncols*self.n*sizeof(long))
+        return ans
+
+    def __reduce__(self):
+        r"""
+        Used in pickling.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            sage: loads(dumps(A)) == A
+            True
+        """
+        return (Matrix_pwn, (self.p, self.m, self.n, self.list()))
+
+    def __richcmp__(left, right, int op):
+        r"""
+        Equality of matrices.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2]]) == Matrix_pwn(3, 3, 2, [[28, 2]])
+            True
+            sage: Matrix_pwn(3, 3, 2, [[1, 2]]) != Matrix_pwn(3, 3, 2, [[1, 3]])
+            True
+        """
+        if op != 2 and op != 3:
+            return NotImplemented
+        if not isinstance(left, Matrix_pwn) or not isinstance(right, Matrix_pwn):
+            return op == 3
+        equal = (left.p, left.m, left.n, left.list()) == (right.p, right.m, right.n, right.list())
+        return equal if op == 2 else not equal
+
+    def __repr__(self):
+        r"""
+        Returns the rows of ``self``, one per line.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            [1, 2]
+            [0, 1]
+        """
+        return "\n".join(["[" + ", ".join([repr(a) for a in row]) + "]" for row in self.list()])
+
+    def nrows(self):
+        r"""
+        Returns the number of rows.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2]]).nrows()
+            1
+        """
+        return self._nrows
+
+    def ncols(self):
+        r"""
+        Returns the number of columns.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2]]).ncols()
+            2
+        """
+        return self._ncols
+
+    def _check_index(self, i, j):
+        r"""
+        Raises an ``IndexError`` unless `(i,j)` is a position in ``self``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2]])[1, 0]
+            Traceback (most recent call last):
+            ...
+            IndexError: matrix index out of range
+        """
+        if i < 0 or i >= self._nrows or j < 0 or j >= self._ncols:
+            raise IndexError("matrix index out of range")
+
+    def __getitem__(self, ij):
+        r"""
+        Returns the entry at ``ij``, as a polynomial over `\ZZ` with
+        coefficients in `[0, p^m)`.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: R.<w> = ZZ[]
+            sage: Matrix_pwn(3, 3, 2, [[1, -w]])[0, 1]
+            26*w
+        """
+        i, j = ij
+        self._check_index(i, j)
+        cdef long* x = self._entry(i, j)
+        cdef int l
+        return PolynomialRing(ZZ, 'w')([x[l] for l in range(self.n)])
+
+    def __setitem__(self, ij, value):
+        r"""
+        Sets the entry at ``ij``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: R.<w> = ZZ[]
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2]])
+            sage: A[0, 0] = w^3 + w - 1; A
+            [w + 26, 2]
+        """
+        i, j = ij
+        self._check_index(i, j)
+        cdef long* x = self._entry(i, j)
+        cdef int l
+        Zm = Zmod(self.pm)
+        coeffs = _coefficients(value)
+        for l in range(self.n):
+            x[l] = Zm(coeffs[l]).lift() if l < len(coeffs) else 0
+
+    def list(self):
+        r"""
+        Returns the entries of ``self`` as a list of rows.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]]).list()
+            [[1, 2], [0, 1]]
+        """
+        return [[self[i, j] for j in range(self._ncols)] for i in range(self._nrows)]
+
+    def valuation(self, i, j):
+        r"""
+        Returns the sum of the `p`-adic valuation and the `w`-adic
+        valuation of the entry at `(i,j)`; this is what row reduction
+        uses to choose pivots.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: R.<w> = ZZ[]
+            sage: A = Matrix_pwn(3, 3, 3, [[3*w + 9*w^2, 0]])
+            sage: A.valuation(0, 0), A.valuation(0, 1)
+            (2, +Infinity)
+        """
+        self._check_index(i, j)
+        cdef long pv, wv
+        cdef long v = _pw_valuation(self._entry(i, j), self.n, self.p, &pv, &wv)
+        if v < 0:
+            return Infinity
+        return v
+
+    def swap_rows(self, int i, int j):
+        r"""
+        Swaps rows ``i`` and ``j``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            sage: A.swap_rows(0, 1); A
+            [0, 1]
+            [1, 2]
+        """
+        self._check_index(i, 0)
+        self._check_index(j, 0)
+        cdef long* t = self._rows[i]
+        self._rows[i] = self._rows[j]
+        self._rows[j] = t
+
+    def swap_cols(self, int i, int j):
+        r"""
+        Swaps columns ``i`` and ``j``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            sage: A.swap_cols(0, 1); A
+            [2, 1]
+            [1, 0]
+        """
+        self._check_index(0, i)
+        self._check_index(0, j)
+        cdef int r, l
+        cdef long t
+        cdef long* x
+        cdef long* y
+        if i == j:
+            return
+        for r in range(self._nrows):
+            x = self._entry(r, i)
+            y = self._entry(r, j)
+            for l in range(self.n):
+                t = x[l]
+                x[l] = y[l]
+                y[l] = t
+
+    cdef int _row_op(self, int i, int j, long* x) except -1:
+        r"""
+        Replaces row ``i`` by row ``i`` minus ``x`` times row ``j``.
+        """
+        cdef int a, l, l1, n = self.n
+        cdef long pm = self.pm
+        cdef long* src
+        cdef long* dst
+        cdef uint128 acc
+        if i == j:
+            return 0
+        for a in range(self._ncols):
+            src = self._entry(j, a)
+            dst = self._entry(i, a)
+            for l in range(n):
+                acc = 0
+                for l1 in range(l+1):
+                    acc += <uint128>x[l1] * src[l-l1]
+                dst[l] = (dst[l] + pm - <long>(acc % pm)) % pm
+        return 0
+
+    def row_op(self, int i, int j, x):
+        r"""
+        Replaces row ``i`` by row ``i`` minus ``x`` times row ``j``.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: R.<w> = ZZ[]
+            sage: A = Matrix_pwn(3, 3, 2, [[1, 2], [0, 1]])
+            sage: A.row_op(0, 1, 1 + w); A
+            [1, 26*w + 1]
+            [0, 1]
+        """
+        self._check_index(i, 0)
+        self._check_index(j, 0)
+        cdef Matrix_pwn X = Matrix_pwn(self.p, self.m, self.n, [[x]])
+        self._row_op(i, j, X._entry(0, 0))
+
+    def row_reduce(self, E=None, start=0):
+        r"""
+        Row reduces ``self`` in place, and returns the matrix of row
+        operations used.
+
+        At each step the entry of least `(p,w)`-valuation in the
+        remaining block is moved to the diagonal, by swapping rows and
+        columns, and the entries below it are cleared.
+
+        INPUT:
+
+        - ``E`` -- (default: None) a matrix with as many rows as
+          ``self``, to which the same row operations are applied; if
+          None, the identity matrix is used
+
+        - ``start`` -- (default: 0) the first diagonal entry to reduce
+
+        OUTPUT:
+
+        - ``E`` after the row operations
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: A = Matrix_pwn(3, 2, 2, [[1, 2], [3, 4]])
+            sage: E = A.row_reduce(); A
+            [1, 2]
+            [0, 7]
+            sage: E
+            [1, 0]
+            [6, 1]
+
+        Entries which cannot be cleared by the pivot are an error::
+
+            sage: R.<w> = ZZ[]
+            sage: Matrix_pwn(3, 2, 2, [[3 + w], [1 + w]]).row_reduce()
+            Traceback (most recent call last):
+            ...
+            ValueError: (w + 3)x = w + 1 mod 9,w^2 not solvable
+        """
+        cdef Matrix_pwn F
+        cdef int s, i, j, rmv, cmv, nrows = self._nrows, ncols = self._ncols
+        cdef long mv, v, pv, wv
+        cdef long* x
+        if E is None:
+            F = self._new_c(nrows, nrows)
+            for i in range(nrows):
+                F._entry(i, i)[0] = 1
+        else:
+            F = <Matrix_pwn?>E
+            if F._nrows != nrows:
+                raise ValueError("E must have as many rows as self")
+        x = <long*>sage_malloc(self.n*sizeof(long))
+        if x == NULL:
+            raise MemoryError
+        try:
+            for s in range(start, min(nrows, ncols)):
+                mv = -1
+                rmv = s
+                cmv = s
+                for i in range(s, nrows):
+                    for j in range(s, ncols):
+                        v = _pw_valuation(self._entry(i, j), self.n, self.p, &pv, &wv)
+                        if v >= 0 and (mv < 0 or v < mv):
+                            mv = v
+                            rmv = i
+                            cmv = j
+                self.swap_rows(s, rmv)
+                F.swap_rows(s, rmv)
+                self.swap_cols(s, cmv)
+                if mv < 0:
+                    break
+                for i in range(s+1, nrows):
+                    if _series_div(self._entry(s, s), self._entry(i, s), x, self.n, self.p, self.pm):
+                        raise ValueError("(%s)x = %s mod %s,w^%s not solvable"%(self[s, s], self[i, s], self.pm, self.n))
+                    self._row_op(i, s, x)
+                    F._row_op(i, s, x)
+        finally:
+            sage_free(x)
+        return F
+
+    def number_nonzero_rows(self):
+        r"""
+        Returns the number of rows of ``self`` up to its last nonzero row;
+        after :meth:`row_reduce` this is the rank.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: Matrix_pwn(3, 2, 2, [[1, 2], [0, 0], [0, 9]]).number_nonzero_rows()
+            1
+        """
+        cdef int r = self._nrows, l
+        cdef long* row
+        while r > 0:
+            row = self._rows[r-1]
+            for l in range(self._ncols*self.n):
+                if row[l] != 0:
+                    return r
+            r -= 1
+        return 0
+
+    def rank(self):
+        r"""
+        Returns the rank of ``self``, i.e. the number of nonzero rows of
+        its row reduction.
+
+        EXAMPLES::
+
+            sage: from sage.modular.pollack_stevens.pwn_matrix import Matrix_pwn
+            sage: R.<w> = ZZ[]
+            sage: Matrix_pwn(3, 2, 2, [[1, w], [2, 2*w]]).rank()
+            1
+            sage: Matrix_pwn(3, 2, 2, [[1, w], [2, 2*w + 3]]).rank()
+            2
+        """
+        cdef Matrix_pwn A = self.__copy__()
+        A.row_reduce()
+        return A.number_nonzero_rows()
+
+def _pwn_ring(p, m, n):
+    r"""
+    Returns `(\ZZ/p^m)[w]/(w^n)`, for the moduli too large for
+    :class:`Matrix_pwn`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import _pwn_ring
+        sage: _pwn_ring(3, 2, 2)
+        Univariate Quotient Polynomial Ring in wbar over Ring of integers modulo 9 with modulus w^2
+    """
+    S = PolynomialRing(Zmod(ZZ(p)**m), 'w')
+    return S.quotient(S.gen()**n, 'wbar')
+
+def _pwn_lift(x):
+    r"""
+    Returns the element ``x`` of :func:`_pwn_ring` as a polynomial over
+    `\ZZ` with coefficients in `[0, p^m)`, as :class:`Matrix_pwn` does.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import _pwn_ring, _pwn_lift
+        sage: R = _pwn_ring(3, 2, 2)
+        sage: _pwn_lift(R.gen() - 1)
+        w + 8
+    """
+    return PolynomialRing(ZZ, 'w')([c.lift() for c in x.lift().list()])
+
+def _generic_inverse(p, m, n, a):
+    r"""
+    Returns the inverse of ``a`` in :func:`_pwn_ring`, or None if ``a``
+    is not a unit.
+
+    With `c` the inverse of the constant term, `e = 1 - ca` lies in the
+    nilpotent ideal `(p,w)`, and `a^{-1} = c(1+e)(1+e^2)(1+e^4)\cdots`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import _generic_inverse
+        sage: R.<w> = ZZ[]
+        sage: _generic_inverse(3, 3, 3, 1 + 3*w)
+        9*wbar^2 + 24*wbar + 1
+        sage: _generic_inverse(3, 3, 3, 3 + w) is None
+        True
+    """
+    R = _pwn_ring(p, m, n)
+    x = R(R.cover_ring()(_coefficients(a)))
+    c = x.lift()[0]
+    if c.lift() % p == 0:
+        return None
+    c = ~c
+    e = 1 - c*x
+    y = R(1)
+    while e != 0:
+        y = y*(1 + e)
+        e = e*e
+    return c*y
+
+def _generic_solve(p, m, n, a, b):
+    r"""
+    Returns a solution of `a x = b` in :func:`_pwn_ring`, or None; this
+    follows the compiled ``_series_div``.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import _generic_solve
+        sage: R.<w> = ZZ[]
+        sage: _generic_solve(3, 3, 3, 3*w, 9*w^2)
+        3*wbar
+        sage: _generic_solve(3, 3, 3, 3*w, w) is None
+        True
+    """
+    R = _pwn_ring(p, m, n)
+    pm = ZZ(p)**m
+    ac = [c.lift() for c in R(R.cover_ring()(_coefficients(a))).lift().padded_list(n)]
+    bc = [c.lift() for c in R(R.cover_ring()(_coefficients(b))).lift().padded_list(n)]
+    if all([c == 0 for c in bc]):
+        return R(0)
+    def pw(x):
+        wv = min([l for l in range(n) if x[l] != 0])
+        pv = min([x[l].valuation(p) for l in range(n) if x[l] != 0])
+        return pv, wv
+    if all([c == 0 for c in ac]):
+        return None
+    v, vv = pw(ac)
+    bv, bvv = pw(bc)
+    if v + vv > bv + bvv:
+        return None
+    pv = ZZ(p)**v
+    for l in range(n):
+        if (l < vv and bc[l] != 0) or bc[l] % pv != 0:
+            return None
+    u = [ac[l+vv] // pv if l + vv < n else 0 for l in range(n)]
+    bq = [bc[l+vv] // pv if l + vv < n else 0 for l in range(n)]
+    uinv = _generic_inverse(p, m, n, u)
+    if uinv is None:
+        return None
+    return uinv * R(R.cover_ring()(bq))
+
+def pwn_inverse(p, m, n, a):
+    r"""
+    Returns the inverse of the unit ``a`` of `(\ZZ/p^m)[w]/(w^n)`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import pwn_inverse
+        sage: R.<w> = ZZ[]
+        sage: pwn_inverse(3, 3, 3, 1 + 3*w)
+        9*w^2 + 24*w + 1
+        sage: pwn_inverse(3, 3, 3, 3 + w)
+        Traceback (most recent call last):
+        ...
+        ValueError: w + 3 not invertible
+
+    Larger moduli are handled too::
+
+        sage: pwn_inverse(5, 30, 3, 1 + 5*w)
+        25*w^2 + 931322574615478515620*w + 1
+    """
+    if not fits(p, m, n):
+        x = _generic_inverse(p, m, n, a)
+        if x is None:
+            R = _pwn_ring(p, m, n)
+            raise ValueError("%s not invertible"%(_pwn_lift(R(R.cover_ring()(_coefficients(a))))))
+        return _pwn_lift(x)
+    cdef Matrix_pwn A = Matrix_pwn(p, m, n, [[a, 0]])
+    if _series_inverse(A._entry(0, 0), A._entry(0, 1), A.n, A.p, A.pm):
+        raise ValueError("%s not invertible"%(A[0, 0]))
+    return A[0, 1]
+
+def pwn_solve(p, m, n, a, b):
+    r"""
+    Returns a solution of `a x = b` in `(\ZZ/p^m)[w]/(w^n)`.
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.pwn_matrix import pwn_solve
+        sage: R.<w> = ZZ[]
+        sage: pwn_solve(3, 3, 3, 3*w + 1, 9*w)
+        9*w
+        sage: pwn_solve(3, 3, 3, 3*w, 9*w^2)
+        3*w
+        sage: pwn_solve(3, 3, 3, 3*w, w)
+        Traceback (most recent call last):
+        ...
+        ValueError: (3*w)x = w mod 27,w^3 not solvable
+        sage: pwn_solve(5, 30, 3, 5*w + 1, 25*w)
+        931322574615478515500*w^2 + 25*w
+    """
+    if not fits(p, m, n):
+        x = _generic_solve(p, m, n, a, b)
+        if x is None:
+            R = _pwn_ring(p, m, n)
+            raise ValueError("(%s)x = %s mod %s,w^%s not solvable"%(_pwn_lift(R(R.cover_ring()(_coefficients(a)))), _pwn_lift(R(R.cover_ring()(_coefficients(b)))), ZZ(p)**m, n))
+        return _pwn_lift(x)
+    cdef Matrix_pwn A = Matrix_pwn(p, m, n, [[a, b, 0]])
+    if _series_div(A._entry(0, 0), A._entry(0, 1), A._entry(0, 2), A.n, A.p, A.pm):
+        raise ValueError("(%s)x = %s mod %s,w^%s not solvable"%(A[0, 0], A[0, 1], A.pm, A.n))
+    return A[0, 2]
@@ -33,6 +33,8 @@ from sage.rings.arith import binomial
 from sage.rings.integer import Integer
 from sage.rings.integer_ring import ZZ
 from sage.rings.rational_field import QQ
+from sage.matrix.constructor import matrix, identity_matrix
+from sage.matrix.matrix_space import MatrixSpace
 from sage.rings.arith import valuation
 from modsym import PSModularSymbolElement_symk, PSModularSymbolElement_dist, PSModSymAction
 from fund_domain import ManinRelations
@@ -41,7 +43,7 @@ from sage.rings.infinity import infinity as oo
 from sage.structure.factory import UniqueFactory
 
 from distributions import Distributions, Symk
-from dist import Dist
+from dist import Dist, Dist_vector, diff_eqn_matrix
 from modsym import PSModularSymbolElement, PSModularSymbolElement_symk, PSModularSymbolElement_dist, PSModSymAction
 from fund_domain import ManinRelations
 from manin_map import ManinMap
@@ -753,6 +755,171 @@ class PSModularSymbolSpace(Module):
 
         return self(D)
 
+    def random_elements(self, K=10, M=None):
+        r"""
+        Returns an iterator producing random OMS in this space with M moments.
+
+        The symbols are built ``K`` at a time: for each generator the
+        moments of ``K`` random distributions are stacked as the rows
+        of a matrix, so that the torsion corrections, the boundary sum
+        and the solution of the difference equation are each a single
+        matrix product rather than ``K`` separate computations.  The
+        iterator never terminates, which is convenient for procedures
+        that keep drawing random symbols until they span a space.
+
+        INPUT:
+
+        - ``K`` -- positive integer (default: 10), the batch size
+
+        - ``M`` -- positive integer, the number of moments
+
+        OUTPUT:
+
+        An iterator over elements of the modular symbol space with ``M`` moments
+
+        When the coefficients are not stored as vectors (or are a space
+        Sym^k) the symbols are produced one at a time by
+        :meth:`random_element`.
+
+        EXAMPLES::
+
+            sage: D = Distributions(0, 11, 10, base=Qp(11, 10))
+            sage: M = PSModularSymbols(Gamma0(11), coefficients=D)
+            sage: R = M.random_elements(5)
+            sage: phi = R.next(); phi
+            Modular symbol of level 11 with values in Space of 11-adic distributions with k=0 action and precision cap 10
+            sage: phi.parent() is M
+            True
+        """
+        CM = self.coefficient_module()
+        if M is None and not CM.is_symk():
+            M = CM.precision_cap()
+        if CM.is_symk() or CM.Element is not Dist_vector:
+            while True:
+                yield self.random_element(M)
+
+        k = CM._k
+        p = self.prime()
+        manin = self.source()
+        gens = manin.gens()
+        two_torsion = manin.reps_with_two_torsion()
+        three_torsion = manin.reps_with_three_torsion()
+        R = CM.base_ring()
+        F = R.fraction_field()
+        SN = Sigma0(manin._N)
+        Id = identity_matrix(F, M)
+        MS = MatrixSpace(R.integer_ring(), K, M)
+
+        def act(g):
+            if not isinstance(g, Sigma0Element):
+                g = SN(g)
+            return CM.acting_matrix(g, M).change_ring(F)
+
+        ## the matrices by which the random moments get multiplied depend
+        ## only on the space, so we compute them once for all batches
+        corrections = {}
+        boundary = {}
+        for g in gens:
+            if g in two_torsion and g in three_torsion:
+                raise ValueError("Level 1 not implemented")
+            if g in two_torsion:
+                corrections[g] = Id - act(manin.two_torsion_matrix(g))
+            elif g in three_torsion:
+                A = act(manin.three_torsion_matrix(g))
+                corrections[g] = 2*Id - A - A**2
+        for g in gens[1:]:
+            if g in two_torsion or g in three_torsion:
+                boundary[g] = -Id
+            else:
+                boundary[g] = act(manin.gammas[g]) - Id
+
+        if k != 0:
+            j = 1
+            while j < len(gens) and (gens[j] in two_torsion or gens[j] in three_torsion):
+                j += 1
+            if j == len(gens):
+                raise ValueError("everything is 2 or 3 torsion!  NOT YET IMPLEMENTED IN THIS CASE")
+            gfix = gens[j]
+            gam = manin.gammas[gfix]
+            a = gam.matrix()[0,0]
+            c = gam.matrix()[1,0]
+            if CM._character != None:
+                chara = CM._character(a)
+            else:
+                chara = 1
+            ## adding err * mu_1 to the value on gfix changes the total measure
+            ## of the boundary term by -err * (chara*k*a^(k-1)*c)
+            errscale = -~F(chara*k*a**(k-1)*c)
+            fixrow = boundary[gfix].matrix_from_rows([1])
+
+        B = diff_eqn_matrix(M, F)
+        while True:
+            D = {}
+            for g in gens:
+                D[g] = MS.random_element().change_ring(F)
+                if corrections.has_key(g):
+                    D[g] = D[g] * corrections[g]
+
+            ## now we compute nu_infty of Prop 5.1 of [PS1] for the whole batch
+            t = sum([D[g] * boundary[g] for g in gens[1:]], matrix(F, K, M))
+
+            if k != 0:
+                err = errscale * t.matrix_from_columns([0])
+                D[gfix].set_block(0, 1, D[gfix].matrix_from_columns([1]) + err)
+                t += err * fixrow
+
+            mu = t * B
+            for i in range(K):
+                values = dict([(g, _dist_from_moments(CM, D[g].row(i))) for g in gens[1:]])
+                values[gens[0]] = -_dist_from_moments(CM, mu.row(i), True)
+                yield self(values)
+
+def _dist_from_moments(D, v, truncate=False):
+    r"""
+    Returns the distribution in ``D`` with moments ``v``.
+
+    The entries of ``v`` lie in the fraction field of the base ring of
+    ``D`` and may have negative valuation, in which case the valuation
+    is absorbed into the ``ordp`` of the result, as in
+    :meth:`~sage.modular.pollack_stevens.dist.Dist_vector.solve_diff_eqn`.
+
+    INPUT:
+
+    - ``D`` -- a space of distributions whose elements are stored as vectors
+
+    - ``v`` -- a vector of moments
+
+    - ``truncate`` -- boolean (default: False), whether to drop the
+      moments that are not known to the precision they should have
+
+    OUTPUT:
+
+    An element of ``D``
+
+    EXAMPLES::
+
+        sage: from sage.modular.pollack_stevens.space import _dist_from_moments
+        sage: D = Distributions(0, 5, 4, base=Qp(5, 4))
+        sage: _dist_from_moments(D, vector(Qp(5, 4), [1/5, 1, 5, 25])).moment(0)
+        5^-1 + O(5^3)
+    """
+    p = D.prime()
+    R = D.base_ring()
+    if p == 0:
+        return D(list(v))
+    ordp = min([a.valuation(p) for a in v] + [0])
+    if ordp < 0:
+        scalar = R.fraction_field()(p) ** (-ordp)
+        v = [R(a * scalar) for a in v]
+    else:
+        ordp = 0
+        v = [R(a) for a in v]
+    N = len(v)
+    if truncate:
+        prec_loss = max([N-j-v[j].precision_absolute() for j in range(N)] + [0])
+        N -= prec_loss
+    return D.Element(D.approx_module(N)(v[:N]), D, ordp, False)
+
 def cusps_from_mat(g):
     r"""
     Returns the cusps associated to an element of a congruence subgroup.